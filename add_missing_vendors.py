@@ -71,27 +71,36 @@ def add_missing_vendors(client_id='spyguy', dry_run=True):
         print("\nTo actually add vendors, run with: dry_run=False")
         return
     
-    # Add vendors to database
+    # Add vendors to database in one request
+    now = datetime.utcnow().isoformat()
+    rows = [{
+        'client_id': client_id,
+        'vendor_name': vendor['vendor_name'],
+        'display_name': vendor['display_name'],
+        'category': vendor['category'],
+        'is_revenue': vendor['is_revenue'],
+        'created_at': now,
+        'updated_at': now
+    } for vendor in missing_vendors]
+    
     added_count = 0
     
-    for vendor in missing_vendors:
-        try:
-            vendor_data = {
-                'client_id': client_id,
-                'vendor_name': vendor['vendor_name'],
-                'display_name': vendor['display_name'],
-                'category': vendor['category'],
-                'is_revenue': vendor['is_revenue'],
-                'created_at': datetime.utcnow().isoformat(),
-                'updated_at': datetime.utcnow().isoformat()
-            }
-            
-            result = supabase.table('vendors').insert(vendor_data).execute()
-            added_count += 1
+    try:
+        supabase.table('vendors').insert(rows, returning='minimal').execute()
+        added_count = len(rows)
+        for vendor in missing_vendors:
             print(f"✅ Added: {vendor['display_name']}")
-            
-        except Exception as e:
-            print(f"❌ Error adding {vendor['display_name']}: {e}")
+    except Exception as e:
+        print(f"⚠️  Bulk insert failed ({e}), retrying vendors one at a time...")
+        # The bulk insert is all-or-nothing; retry per row so one existing or
+        # invalid vendor doesn't block the rest
+        for row in rows:
+            try:
+                supabase.table('vendors').insert(row, returning='minimal').execute()
+                added_count += 1
+                print(f"✅ Added: {row['display_name']}")
+            except Exception as e:
+                print(f"❌ Error adding {row['display_name']}: {e}")
     
     print(f"\n🎉 Successfully added {added_count}/{len(missing_vendors)} vendors")
     print("\n📈 Expected impact:")
@@ -3,24 +3,38 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 import os
+import re
 import json
+import asyncio
+import hashlib
 import numpy as np
 from sklearn.cluster import DBSCAN
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI, RateLimitError
 from supabase_client import supabase
 from config.client_context import get_current_client
+from utils.batching import chunks
 
 client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+# Embedding requests: inputs per call (API cap is 2048) and calls in flight
+EMBED_BATCH_SIZE = 1000
+EMBED_MAX_CONCURRENCY = 4
+EMBED_MAX_RETRIES = 5
+
+# Vendor-name embeddings persisted between runs, keyed by sha256(model:name)
+EMBEDDING_CACHE_FILE = Path.home() / '.cfo_forecast' / 'vendor_embeddings.npz'
+
+PAYMENT_PROCESSORS = (
+    "STRIPE", "PAYPAL", "SHOPIFY", "AFRM", "SHOPPAYINST",
+    "SQUARE", "VENMO", "ZELLE", "CASHAPP", "WISE",
+    "REVOLUT", "TRANSFERWISE", "MERCADOPAGO", "KLARNA",
+    "AFFIRM", "AFTERPAY", "SHOPPAY", "APPLEPAY", "GOOGLEPAY"
+)
+_PAYMENT_PROCESSOR_RE = re.compile("|".join(map(re.escape, PAYMENT_PROCESSORS)))
+
 def is_payment_processor(vendor_name: str) -> bool:
     """Check if a vendor is a payment processor."""
-    payment_processors = [
-        "STRIPE", "PAYPAL", "SHOPIFY", "AFRM", "SHOPPAYINST",
-        "SQUARE", "VENMO", "ZELLE", "CASHAPP", "WISE",
-        "REVOLUT", "TRANSFERWISE", "MERCADOPAGO", "KLARNA",
-        "AFFIRM", "AFTERPAY", "SHOPPAY", "APPLEPAY", "GOOGLEPAY"
-    ]
-    return any(processor in vendor_name.upper() for processor in payment_processors)
+    return _PAYMENT_PROCESSOR_RE.search(vendor_name.upper()) is not None
 
 def fetch_unlocked_vendors(client_id=None):
     if client_id is None:
@@ -33,14 +47,83 @@ def fetch_unlocked_vendors(client_id=None):
         .execute()
     return [row["vendor_name"] for row in resp.data]
 
-def embed_texts(texts, model="text-embedding-ada-002"):
-    resp = client.embeddings.create(input=texts, model=model)
-    return np.array([e.embedding for e in resp.data])
+async def _embed_all(texts, model, batch_size):
+    semaphore = asyncio.Semaphore(EMBED_MAX_CONCURRENCY)
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    results = [None] * len(batches)
+
+    # The context manager closes the client even when a batch fails
+    async with AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")) as async_client:
+        async def _embed_batch(idx, chunk):
+            async with semaphore:
+                for attempt in range(EMBED_MAX_RETRIES):
+                    try:
+                        resp = await async_client.embeddings.create(input=chunk, model=model)
+                        break
+                    except RateLimitError:
+                        if attempt == EMBED_MAX_RETRIES - 1:
+                            raise
+                        await asyncio.sleep(2 ** attempt)
+            results[idx] = [e.embedding for e in resp.data]
+
+        await asyncio.gather(*(_embed_batch(i, b) for i, b in enumerate(batches)))
+
+    dim = len(results[0][0])
+    out = np.empty((len(texts), dim), dtype=np.float32)
+    for idx, vectors in enumerate(results):
+        out[idx * batch_size:idx * batch_size + len(vectors)] = vectors
+    return out
+
+def embed_texts(texts, model="text-embedding-ada-002", batch_size=EMBED_BATCH_SIZE):
+    """Embed texts in fixed-size batches, a few requests in flight at once."""
+    if not texts:
+        return np.empty((0, 0), dtype=np.float32)
+    return asyncio.run(_embed_all(list(texts), model, batch_size))
+
+def _embedding_key(text, model):
+    return hashlib.sha256(f"{model}:{text}".encode("utf-8")).hexdigest()
+
+def load_embedding_cache(path=EMBEDDING_CACHE_FILE):
+    """Load cached embeddings as {key: vector}; empty if missing or unreadable."""
+    try:
+        with np.load(path) as data:
+            return dict(zip(data["keys"].tolist(), data["vectors"]))
+    except (OSError, KeyError, ValueError):
+        return {}
+
+def save_embedding_cache(cache, path=EMBEDDING_CACHE_FILE):
+    if not cache:
+        return
+    path.parent.mkdir(exist_ok=True)
+    keys = list(cache)
+    # np.savez appends .npz to bare names, so write through a file handle
+    with open(path, "wb") as f:
+        np.savez(f, keys=np.array(keys), vectors=np.stack([cache[k] for k in keys]))
+
+def embed_texts_cached(texts, model="text-embedding-ada-002"):
+    """Embed texts, only calling OpenAI for names missing from the local cache."""
+    cache = load_embedding_cache()
+    keys = [_embedding_key(t, model) for t in texts]
+    missing = [i for i, k in enumerate(keys) if k not in cache]
+
+    if missing:
+        new_vectors = embed_texts([texts[i] for i in missing], model=model)
+        for i, vector in zip(missing, new_vectors):
+            cache[keys[i]] = vector
+        save_embedding_cache(cache)
+
+    print(f"Embeddings: {len(texts) - len(missing)} cached, {len(missing)} new")
+    return np.stack([cache[k] for k in keys]).astype(np.float32)
 
 def cluster_embeddings(embeddings, eps=0.1, min_samples=2):
-    # cosine distance = 1 - cosine similarity
-    clustering = DBSCAN(eps=eps, min_samples=min_samples, metric="cosine") \
-        .fit(embeddings)
+    # eps is a cosine distance. On unit vectors ||a-b||^2 = 2 * (1 - cos(a, b)),
+    # so the equivalent euclidean radius is sqrt(2 * eps), which lets DBSCAN
+    # use a ball tree instead of a brute-force cosine distance matrix.
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    unit = embeddings / np.where(norms == 0, 1, norms)
+    clustering = DBSCAN(eps=np.sqrt(2 * eps), min_samples=min_samples,
+                        metric="euclidean", algorithm="ball_tree", n_jobs=-1) \
+        .fit(unit)
     return clustering.labels_
 
 def name_cluster(vendor_list):
@@ -55,17 +138,53 @@ Return ONLY the name."""
     )
     return resp.choices[0].message.content.strip()
 
+def name_clusters(clusters):
+    """Name every cluster with one chat completion; returns {label: display_name}."""
+    payload = {str(int(lbl)): members for lbl, members in clusters.items()}
+    prompt = f"""You are a CFO assistant.  
+Each key below is a cluster id and each value is a list of vendor strings that all refer to the same underlying payee.
+For each cluster, propose a concise, human-friendly **display_name**:
+{json.dumps(payload, indent=2)}
+
+Return ONLY a JSON object mapping each cluster id to its display_name."""
+    resp = client.chat.completions.create(
+        model="gpt-4o",
+        response_format={"type": "json_object"},
+        messages=[{"role":"user","content":prompt}]
+    )
+    names = json.loads(resp.choices[0].message.content)
+
+    # Fall back to naming individually anything the batch response left out
+    return {
+        lbl: (names.get(str(int(lbl))) or "").strip() or name_cluster(members)
+        for lbl, members in clusters.items()
+    }
+
 def write_back_cluster(vendors, cluster_id, display_name, client_id=None):
     if client_id is None:
         client_id = get_current_client()
     
-    for v in vendors:
+    # One UPDATE ... WHERE vendor_name IN (...) per batch instead of one per vendor
+    for batch in chunks(vendors):
         supabase.table("vendors").update({
             "display_name": display_name,
             "vendor_group": display_name,
             "group_locked": True
         }).eq("client_id", client_id) \
-          .eq("vendor_name", v).execute()
+          .in_("vendor_name", batch).execute()
+
+def write_back_individual(vendors, client_id=None):
+    """Lock each vendor as its own group, one UPDATE per batch."""
+    if client_id is None:
+        client_id = get_current_client()
+
+    # Each row's display name is its own vendor name, so the update runs in
+    # SQL (see database/analysis_functions.sql) rather than as a PostgREST PATCH
+    for batch in chunks(vendors):
+        supabase.rpc("lock_vendors_as_own_group", {
+            "p_client_id": client_id,
+            "p_vendor_names": batch
+        }).execute()
 
 def run():
     client_id = get_current_client()
@@ -89,13 +208,9 @@ def run():
     print(f"\nFound {len(payment_processors)} payment processors:")
     for pp in payment_processors:
         print(f"  - {pp}")
-        # Keep payment processors as individual entries
-        supabase.table("vendors").update({
-            "display_name": pp,
-            "vendor_group": pp,
-            "group_locked": True
-        }).eq("client_id", client_id) \
-          .eq("vendor_name", pp).execute()
+    # Keep payment processors as individual entries
+    if payment_processors:
+        write_back_individual(payment_processors, client_id)
 
     if not other_vendors:
         print("\nNo other vendors to cluster.")
@@ -104,7 +219,7 @@ def run():
     print(f"\nClustering {len(other_vendors)} other vendors...")
 
     # 2) Embed all other vendor names
-    embs = embed_texts(other_vendors)
+    embs = embed_texts_cached(other_vendors)
     print("Generated embeddings")
 
     # 3) Cluster
@@ -116,6 +231,9 @@ def run():
     for name, lbl in zip(other_vendors, labels):
         clusters.setdefault(lbl, []).append(name)
 
+    named = {lbl: members for lbl, members in clusters.items() if lbl != -1}
+    display_names = name_clusters(named) if named else {}
+
     print(f"\nFound {len(clusters)} clusters:")
     for lbl, members in clusters.items():
         if lbl == -1:
@@ -127,7 +245,7 @@ def run():
         print(f"\nCluster {lbl} ({len(members)} vendors):")
         for v in members:
             print(f"  - {v}")
-        display_name = name_cluster(members)
+        display_name = display_names[lbl]
         print(f"  → {display_name}")
         write_back_cluster(members, lbl, display_name, client_id)
 
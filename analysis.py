@@ -2,10 +2,26 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
+import re
 import datetime
 from collections import defaultdict
+from dateutil.relativedelta import relativedelta
 from supabase_client import supabase
 
+# Substring rules in priority order; first matching category wins
+VENDOR_CATEGORY_RULES = [
+    ("Credit Card Payments", ["AMEX", "CHASE", "CAPITAL ONE", "CREDIT CRD", "JPMORGAN"]),
+    ("State Tax Payments", ["TAX", "TAXATION", "REVENUE", "DEPT", "SSTPTAX"]),
+    ("Internal Transfers", ["TRANSFER", "TRNSFR", "MERCURY", "AUTO-TRANSFER"]),
+    ("Payment Processor Transfers", ["STRIPE", "PAYPAL", "SHOPIFY", "AFRM", "SHOPPAYINST"]),
+]
+
+# One compiled alternation per category, built once at import
+_VENDOR_CATEGORY_PATTERNS = [
+    (re.compile("|".join(re.escape(s) for s in substrings)), label)
+    for label, substrings in VENDOR_CATEGORY_RULES
+]
+
 def normalize_vendor_name(vendor_name: str) -> str:
     """Normalize vendor names to group related transactions."""
     if not vendor_name:
@@ -14,21 +30,9 @@ def normalize_vendor_name(vendor_name: str) -> str:
     # Convert to uppercase for consistent matching
     name = vendor_name.upper()
     
-    # Credit card payments
-    if any(s in name for s in ["AMEX", "CHASE", "CAPITAL ONE", "CREDIT CRD", "JPMORGAN"]):
-        return "Credit Card Payments"
-    
-    # State tax payments
-    if any(s in name for s in ["TAX", "TAXATION", "REVENUE", "DEPT", "SSTPTAX"]):
-        return "State Tax Payments"
-    
-    # Internal transfers
-    if any(s in name for s in ["TRANSFER", "TRNSFR", "MERCURY", "AUTO-TRANSFER"]):
-        return "Internal Transfers"
-    
-    # Payment processors
-    if any(s in name for s in ["STRIPE", "PAYPAL", "SHOPIFY", "AFRM", "SHOPPAYINST"]):
-        return "Payment Processor Transfers"
+    for pattern, label in _VENDOR_CATEGORY_PATTERNS:
+        if pattern.search(name):
+            return label
     
     return vendor_name
 
@@ -38,38 +42,28 @@ def fetch_monthly_counts_by_display(client_id: str, months: int = 6):
     """
     today = datetime.date.today().replace(day=1)
     # start at beginning of month N months ago
-    start_month = (today - datetime.timedelta(days=months*30)).replace(day=1)
+    start_month = today - relativedelta(months=months)
 
-    # First get vendor name to display name mapping
-    resp = supabase.table("vendors") \
-        .select("vendor_name, display_name") \
-        .eq("client_id", client_id) \
-        .execute()
-    vendor_map = {v["vendor_name"]: v["display_name"] for v in resp.data}
+    # aggregate (display_name, month) in Postgres; see database/analysis_functions.sql
+    resp = supabase.rpc("get_vendor_month_activity", {
+        "p_client_id": client_id,
+        "p_start_date": start_month.isoformat()
+    }).execute()
 
-    # pull transactions
-    resp = supabase.table("transactions") \
-        .select("transaction_date, amount, vendor_name") \
-        .eq("client_id", client_id) \
-        .gte("transaction_date", start_month.isoformat()) \
-        .order("transaction_date") \
-        .execute()
-    records = resp.data
+    rows = resp.data
+
+    # Unmapped vendors fall back to the normalized vendor name; classify each
+    # distinct name once up front rather than per row
+    resolve = {
+        name: normalize_vendor_name(name) or name
+        for name in {r["display"] for r in rows if not r["is_mapped"]}
+    }
 
     # build month buckets
     counts = defaultdict(set)  # display_name -> set of "YYYY-MM"
-    for tx in records:
-        # First try to get display name from vendor map
-        display = vendor_map.get(tx["vendor_name"])
-        # If no display name, use normalized vendor name
-        if not display:
-            display = normalize_vendor_name(tx["vendor_name"])
-        # If still no display name, use original vendor name
-        if not display:
-            display = tx["vendor_name"]
-            
-        month_key = tx["transaction_date"][:7]  # "2025-04"
-        counts[display].add(month_key)
+    for row in rows:
+        display = row["display"] if row["is_mapped"] else resolve[row["display"]]
+        counts[display].add(row["month"])
 
     # convert to sorted lists
     return {d: sorted(list(months)) for d, months in counts.items()}
@@ -5,22 +5,26 @@ a client with more recent data.
 
 from supabase_client import supabase
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 import sys
 
+# Status cutoffs, compared against ISO date strings
+CURRENT_SINCE = '2025-07-01'
+RECENT_ACTIVITY_SINCE = '2025-06-01'
+THIS_YEAR_SINCE = '2025-01-01'
+MAX_WORKERS = 8
+
 def get_all_clients():
     """Get all unique client IDs from the transactions table."""
     try:
-        result = supabase.table('transactions') \
-            .select('client_id') \
-            .execute()
+        # DISTINCT runs in Postgres; see database/analysis_functions.sql
+        result = supabase.rpc('get_distinct_client_ids').execute()
         
         if not result.data:
             print("No transactions found in database")
             return []
         
-        # Get unique client IDs
-        client_ids = list(set(txn['client_id'] for txn in result.data if txn['client_id']))
-        return sorted(client_ids)
+        return [row['client_id'] for row in result.data]
         
     except Exception as e:
         print(f"Error getting clients: {e}")
@@ -29,14 +33,14 @@ def get_all_clients():
 def analyze_client_transactions(client_id: str):
     """Analyze transaction data for a specific client."""
     try:
-        # Get transaction summary for this client
-        result = supabase.table('transactions') \
-            .select('transaction_date, amount') \
-            .eq('client_id', client_id) \
-            .order('transaction_date', desc=False) \
-            .execute()
+        # Aggregate in Postgres; see database/analysis_functions.sql
+        result = supabase.rpc('client_transaction_summary', {
+            'p_client_id': client_id,
+            'p_recent_since': RECENT_ACTIVITY_SINCE
+        }).execute()
         
-        if not result.data:
+        summary = result.data[0] if result.data else None
+        if not summary or not summary['cnt']:
             return {
                 'client_id': client_id,
                 'transaction_count': 0,
@@ -46,18 +50,14 @@ def analyze_client_transactions(client_id: str):
                 'error': 'No transactions found'
             }
         
-        transactions = result.data
-        dates = [txn['transaction_date'] for txn in transactions]
-        amounts = [float(txn['amount']) for txn in transactions]
-        
         return {
             'client_id': client_id,
-            'transaction_count': len(transactions),
-            'earliest_date': min(dates),
-            'latest_date': max(dates),
-            'total_amount': sum(amounts),
-            'avg_monthly_transactions': len(transactions) / max(1, len(set(date[:7] for date in dates))),
-            'recent_activity': len([d for d in dates if d >= '2025-06-01'])  # Transactions since June 2025
+            'transaction_count': summary['cnt'],
+            'earliest_date': summary['earliest'],
+            'latest_date': summary['latest'],
+            'total_amount': float(summary['total']),
+            'avg_monthly_transactions': summary['cnt'] / max(1, summary['months']),
+            'recent_activity': summary['recent']  # Transactions since June 2025
         }
         
     except Exception as e:
@@ -83,15 +83,14 @@ def main():
     
     print(f"Found {len(clients)} clients: {', '.join(clients)}\n")
     
-    # Analyze each client
-    client_analyses = []
-    for client_id in clients:
-        print(f"Analyzing {client_id}...")
-        analysis = analyze_client_transactions(client_id)
-        client_analyses.append(analysis)
+    # Analyze clients concurrently; each call is one blocking Supabase request
+    print(f"Analyzing {len(clients)} clients...")
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        client_analyses = list(executor.map(analyze_client_transactions, clients))
     
     # Sort by latest transaction date (most recent first)
-    client_analyses.sort(key=lambda x: x.get('latest_date', '0000-00-00'), reverse=True)
+    # (clients with no data have latest_date=None and sort last)
+    client_analyses.sort(key=lambda x: x.get('latest_date') or '0000-00-00', reverse=True)
     
     # Display results
     print("\n" + "="*100)
@@ -116,11 +115,11 @@ def main():
             date_range = f"{earliest} to {latest}"
             
             # Determine status based on latest date
-            if latest >= '2025-07-01':
+            if latest >= CURRENT_SINCE:
                 status = "🟢 Current (July 2025+)"
-            elif latest >= '2025-06-01':
+            elif latest >= RECENT_ACTIVITY_SINCE:
                 status = "🟡 Recent (June 2025+)"
-            elif latest >= '2025-01-01':
+            elif latest >= THIS_YEAR_SINCE:
                 status = "🟠 This Year (2025)"
             else:
                 status = "🔴 Older Data"
@@ -136,25 +135,27 @@ def main():
     print("RECOMMENDATIONS")
     print("="*100)
     
-    # Find client with most recent data
-    current_clients = [c for c in client_analyses if c.get('latest_date', '0000-00-00') >= '2025-07-01']
-    recent_clients = [c for c in client_analyses if c.get('latest_date', '0000-00-00') >= '2025-06-01']
-    active_clients = [c for c in client_analyses if c.get('transaction_count', 0) > 100]
+    # Find client with most recent data. The list is already sorted by latest
+    # date, so the newest client is first and the active-client scan stops at
+    # the first match.
+    newest = client_analyses[0]
+    newest_date = newest.get('latest_date') or '0000-00-00'
+    active_client = next((c for c in client_analyses if c.get('transaction_count', 0) > 100), None)
     
-    if current_clients:
-        best_client = current_clients[0]
+    if newest_date >= CURRENT_SINCE:
+        best_client = newest
         print(f"✅ BEST OPTION: '{best_client['client_id']}' has the most recent data")
         print(f"   - {best_client['transaction_count']} transactions")
         print(f"   - Latest transaction: {best_client['latest_date']}")
         print(f"   - {best_client['recent_activity']} transactions since June 2025")
-    elif recent_clients:
-        best_client = recent_clients[0]
+    elif newest_date >= RECENT_ACTIVITY_SINCE:
+        best_client = newest
         print(f"⭐ GOOD OPTION: '{best_client['client_id']}' has recent data")
         print(f"   - {best_client['transaction_count']} transactions")
         print(f"   - Latest transaction: {best_client['latest_date']}")
         print(f"   - {best_client['recent_activity']} transactions since June 2025")
-    elif active_clients:
-        best_client = active_clients[0]
+    elif active_client:
+        best_client = active_client
         print(f"📊 ACTIVE OPTION: '{best_client['client_id']}' has most transaction data")
         print(f"   - {best_client['transaction_count']} transactions")
         print(f"   - Latest transaction: {best_client['latest_date']}")
@@ -8,6 +8,7 @@ sys.path.append('.')
 
 from lean_forecasting.temp_vendor_groups import temp_vendor_group_manager
 from datetime import datetime, date, timedelta
+import numpy as np
 import pandas as pd
 
 def analyze_amazon_only():
@@ -28,10 +29,16 @@ def analyze_amazon_only():
         print("❌ No Amazon Revenue transactions found")
         return
     
-    # Convert to DataFrame for analysis
-    df = pd.DataFrame(amazon_transactions)
-    df['transaction_date'] = pd.to_datetime(df['transaction_date'])
-    df['amount'] = df['amount'].astype(float)
+    # Build typed columns directly instead of coercing object columns afterwards
+    df = pd.DataFrame({
+        'transaction_date': pd.to_datetime(
+            [t['transaction_date'] for t in amazon_transactions], format='ISO8601'
+        ),
+        'amount': np.fromiter(
+            (float(t['amount']) for t in amazon_transactions), dtype=np.float64, count=len(amazon_transactions)
+        ),
+        'vendor_name': [t['vendor_name'] for t in amazon_transactions],
+    })
     
     print(f"\nDATE RANGE: {df['transaction_date'].min().date()} to {df['transaction_date'].max().date()}")
     print(f"TOTAL AMAZON REVENUE: ${df['amount'].sum():,.2f}")
@@ -45,12 +52,20 @@ def analyze_amazon_only():
     
     # Show daily totals for last 2 weeks
     print(f"\n📅 DAILY AMAZON TOTALS (LAST 14 DAYS):")
-    last_14_days = df[df['transaction_date'] >= df['transaction_date'].max() - pd.Timedelta(days=14)]
-    daily_totals = last_14_days.groupby(last_14_days['transaction_date'].dt.date)['amount'].sum().sort_index(ascending=False)
-    
-    for date_val, amount in daily_totals.items():
-        day_name = pd.to_datetime(date_val).strftime('%A')
-        print(f"{date_val} ({day_name}): ${amount:,.2f}")
+    # Bucket by day offset from the window start instead of grouping on date objects
+    window_days = 15  # latest date back 14 days, inclusive
+    days = df['transaction_date'].to_numpy().astype('datetime64[D]')
+    first_day = days.max() - np.timedelta64(window_days - 1, 'D')
+    offsets = (days - first_day).astype(np.int64)
+    in_window = offsets >= 0
+    day_counts = np.bincount(offsets[in_window], minlength=window_days)
+    daily_totals = np.bincount(offsets[in_window], weights=df['amount'].to_numpy()[in_window],
+                               minlength=window_days)
+    
+    for offset in np.flatnonzero(day_counts)[::-1]:
+        date_val = (first_day + np.timedelta64(offset, 'D')).astype(date)
+        day_name = date_val.strftime('%A')
+        print(f"{date_val} ({day_name}): ${daily_totals[offset]:,.2f}")
     
     # Pattern analysis
     df['day_of_week'] = df['transaction_date'].dt.dayofweek + 1  # 1=Monday
@@ -80,19 +95,28 @@ def analyze_all_revenue_streams():
     revenue_streams = ['Amazon Revenue', 'BestSelf Revenue', 'Faire Revenue', 
                       'PayPal Revenue', 'Shopify Revenue', 'Stripe Revenue', 'TikTok Revenue']
     
+    # One query for every stream, then split by display name locally
+    transactions = temp_vendor_group_manager.get_vendor_group_transactions(
+        client_id, revenue_streams, 90, columns='amount, vendor_name'
+    )
+    if transactions:
+        df_all = pd.DataFrame({
+            'display_name': [t['display_name'] for t in transactions],
+            'amount': np.fromiter(
+                (float(t['amount']) for t in transactions), dtype=np.float64, count=len(transactions)
+            ),
+        })
+        stream_stats = df_all.groupby('display_name')['amount'].agg(['sum', 'count', 'mean'])
+    else:
+        stream_stats = pd.DataFrame(columns=['sum', 'count', 'mean'])
+    
     stream_analysis = {}
     
     for stream in revenue_streams:
-        transactions = temp_vendor_group_manager.get_vendor_group_transactions(
-            client_id, [stream], 90
-        )
-        
-        if transactions:
-            df = pd.DataFrame(transactions)
-            df['amount'] = df['amount'].astype(float)
-            total = df['amount'].sum()
-            count = len(transactions)
-            avg = df['amount'].mean()
+        if stream in stream_stats.index:
+            total = stream_stats.at[stream, 'sum']
+            count = int(stream_stats.at[stream, 'count'])
+            avg = stream_stats.at[stream, 'mean']
             
             stream_analysis[stream] = {
                 'total': total,
@@ -8,7 +8,28 @@ sys.path.append('.')
 
 from supabase_client import supabase
 from datetime import datetime, date
+import numpy as np
 import pandas as pd
+from utils.buffered_output import buffered_stdout
+
+WEEKDAY_NAMES = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+def fetch_display_name_transactions(client_id, display_name, page_size=1000):
+    """Every transaction mapped to display_name, keyset-paged past PostgREST's row cap."""
+    rows = []
+    params = {
+        'p_client_id': client_id,
+        'p_display_name': display_name,
+        'p_limit': page_size
+    }
+    while True:
+        # rpc() builders can't .range(), so the function pages on (date, id) itself
+        page = supabase.rpc('get_display_name_transactions', params).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        params['p_after_date'] = page[-1]['transaction_date']
+        params['p_after_id'] = page[-1]['id']
 
 def analyze_amazon_transactions():
     """Deep dive into Amazon transaction timing."""
@@ -18,39 +39,20 @@ def analyze_amazon_transactions():
     client_id = 'bestself'
     
     try:
-        # Get all Amazon transactions
-        result = supabase.table('vendors').select('vendor_name').eq(
-            'client_id', client_id
-        ).eq(
-            'display_name', 'Amazon Revenue'
-        ).execute()
-        
-        if not result.data:
-            print("❌ No Amazon vendors found")
-            return
-        
-        vendor_names = [v['vendor_name'] for v in result.data]
-        print(f"📊 Found {len(vendor_names)} Amazon vendor names")
-        
-        # Get all transactions for these vendors
-        txn_result = supabase.table('transactions').select(
-            'transaction_date, amount, vendor_name'
-        ).eq(
-            'client_id', client_id
-        ).in_(
-            'vendor_name', vendor_names
-        ).execute()
+        # Vendor lookup joined into the transaction fetch; see database/analysis_functions.sql
+        rows = fetch_display_name_transactions(client_id, 'Amazon Revenue')
         
-        if not txn_result.data:
+        if not rows:
             print("❌ No Amazon transactions found")
-            return
+            return None, None
         
-        print(f"📊 Found {len(txn_result.data)} Amazon transactions")
-        
-        # Convert to DataFrame for analysis
-        df = pd.DataFrame(txn_result.data)
-        df['transaction_date'] = pd.to_datetime(df['transaction_date'])
+        df = pd.DataFrame(rows)
+        df['transaction_date'] = pd.to_datetime(df['transaction_date'], format='%Y-%m-%d', cache=True)
         df['amount'] = df['amount'].astype(float)
+        
+        print(f"📊 Found {df['vendor_name'].nunique()} Amazon vendor names")
+        print(f"📊 Found {len(df)} Amazon transactions")
+        
         df['weekday'] = df['transaction_date'].dt.day_name()
         df['weekday_num'] = df['transaction_date'].dt.weekday  # 0=Monday, 1=Tuesday, etc.
         
@@ -61,24 +63,26 @@ def analyze_amazon_transactions():
         print(f"\n💰 LARGE AMAZON TRANSACTIONS (>=$10k):")
         print(f"Found {len(large_txns)} large transactions")
         
-        for _, txn in large_txns.iterrows():
-            weekday = txn['weekday']
-            date_str = txn['transaction_date'].strftime('%Y-%m-%d')
-            amount = txn['amount']
-            print(f"  {date_str} ({weekday}): ${amount:,.2f}")
+        dates = large_txns['transaction_date'].dt.strftime('%Y-%m-%d').to_numpy()
+        weekdays = large_txns['weekday'].to_numpy()
+        amounts = large_txns['amount'].to_numpy()
+        if len(large_txns):
+            print("\n".join(f"  {d} ({w}): ${a:,.2f}" for d, w, a in zip(dates, weekdays, amounts)))
         
         # Analyze weekday patterns
+        weekday_counts = np.bincount(large_txns['weekday_num'].to_numpy(), minlength=7)
         if len(large_txns) > 0:
-            weekday_counts = large_txns['weekday'].value_counts()
-            weekday_num_counts = large_txns['weekday_num'].value_counts()
             
             print(f"\n📊 WEEKDAY DISTRIBUTION:")
-            for weekday, count in weekday_counts.items():
+            for weekday_num in np.argsort(-weekday_counts, kind='stable'):
+                count = weekday_counts[weekday_num]
+                if count == 0:
+                    break
                 percentage = (count / len(large_txns)) * 100
-                print(f"  {weekday}: {count} transactions ({percentage:.1f}%)")
+                print(f"  {WEEKDAY_NAMES[weekday_num]}: {count} transactions ({percentage:.1f}%)")
             
-            most_common_weekday = weekday_counts.index[0]
-            most_common_count = weekday_counts.iloc[0]
+            most_common_weekday = WEEKDAY_NAMES[weekday_counts.argmax()]
+            most_common_count = weekday_counts.max()
             
             print(f"\n🎯 MOST COMMON DAY: {most_common_weekday} ({most_common_count}/{len(large_txns)} transactions)")
             
@@ -88,25 +92,28 @@ def analyze_amazon_transactions():
                 
                 # Check if these are actually Monday deposits processed on Tuesday
                 print(f"\nLet's check ALL Amazon transactions by weekday:")
-                all_weekday_counts = df['weekday'].value_counts()
-                for weekday, count in all_weekday_counts.items():
-                    avg_amount = df[df['weekday'] == weekday]['amount'].mean()
-                    print(f"  {weekday}: {count} txns, avg ${avg_amount:,.2f}")
+                all_weekday_num = df['weekday_num'].to_numpy()
+                all_counts = np.bincount(all_weekday_num, minlength=7)
+                all_sums = np.bincount(all_weekday_num, weights=df['amount'].to_numpy(), minlength=7)
+                for weekday_num in np.argsort(-all_counts, kind='stable'):
+                    count = all_counts[weekday_num]
+                    if count == 0:
+                        break
+                    print(f"  {WEEKDAY_NAMES[weekday_num]}: {count} txns, avg ${all_sums[weekday_num] / count:,.2f}")
         
         # Check transaction gaps for bi-weekly pattern
         if len(large_txns) > 1:
             print(f"\n📅 TRANSACTION GAPS (days between large deposits):")
-            gaps = []
-            for i in range(1, len(large_txns)):
-                prev_date = large_txns.iloc[i-1]['transaction_date']
-                curr_date = large_txns.iloc[i]['transaction_date']
-                gap = (curr_date - prev_date).days
-                gaps.append(gap)
-                print(f"  {prev_date.strftime('%Y-%m-%d')} → {curr_date.strftime('%Y-%m-%d')}: {gap} days")
+            days = large_txns['transaction_date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+            gaps = np.diff(days)
+            print("\n".join(
+                f"  {prev_date} → {curr_date}: {gap} days"
+                for prev_date, curr_date, gap in zip(dates[:-1], dates[1:], gaps)
+            ))
             
-            if gaps:
-                avg_gap = sum(gaps) / len(gaps)
-                most_common_gap = max(set(gaps), key=gaps.count)
+            if len(gaps):
+                avg_gap = gaps.mean()
+                most_common_gap = int(np.bincount(gaps).argmax())
                 print(f"\n📊 Average gap: {avg_gap:.1f} days")
                 print(f"📊 Most common gap: {most_common_gap} days")
                 
@@ -115,16 +122,21 @@ def analyze_amazon_transactions():
                 elif 13 <= most_common_gap <= 15:
                     print(f"✅ Close to bi-weekly: {most_common_gap} days")
         
-        return large_txns
+        return large_txns, weekday_counts
         
     except Exception as e:
         print(f"❌ Error analyzing Amazon transactions: {e}")
         import traceback
         traceback.print_exc()
-        return None
+        return None, None
 
-def suggest_timing_fix(large_txns):
-    """Suggest how to fix the timing detection."""
+def suggest_timing_fix(large_txns, weekday_counts):
+    """
+    Suggest how to fix the timing detection.
+    
+    weekday_counts is the per-weekday deposit count (index 0=Monday)
+    already computed by analyze_amazon_transactions.
+    """
     print(f"\n🔧 TIMING DETECTION FIX SUGGESTIONS")
     print("=" * 50)
     
@@ -132,11 +144,8 @@ def suggest_timing_fix(large_txns):
         print("❌ No data to analyze")
         return
     
-    weekday_counts = large_txns['weekday_num'].value_counts()
-    most_common_weekday_num = weekday_counts.index[0]
-    
-    weekday_names = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    detected_day = weekday_names[most_common_weekday_num]
+    most_common_weekday_num = int(weekday_counts.argmax())
+    detected_day = WEEKDAY_NAMES[most_common_weekday_num]
     
     print(f"Current detection: {detected_day}")
     print(f"User expectation: Monday")
@@ -166,8 +175,8 @@ def main():
     print("🚀 AMAZON TIMING ANALYSIS")
     print("=" * 70)
     
-    large_txns = analyze_amazon_transactions()
-    fix_suggestion = suggest_timing_fix(large_txns)
+    large_txns, weekday_counts = analyze_amazon_transactions()
+    fix_suggestion = suggest_timing_fix(large_txns, weekday_counts)
     
     if fix_suggestion:
         print(f"\n✅ ANALYSIS COMPLETE")
@@ -176,4 +185,5 @@ def main():
         print(f"\n❌ No clear timing issue found")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    with buffered_stdout():
+        main()
\ No newline at end of file
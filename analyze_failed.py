@@ -3,58 +3,56 @@
 Analyze failed transactions in Mercury CSV
 """
 
-import csv
+import pandas as pd
+from utils.buffered_output import buffered_stdout
+
+CSV_COLUMNS = ['Date (UTC)', 'Description', 'Amount', 'Status', 'Source Account']
 
 def analyze_failed_transactions():
-    with open('BS_mercury_transactions.csv', 'r') as f:
-        reader = csv.DictReader(f)
-        failed = []
-        total_count = 0
-        
-        for row in reader:
-            total_count += 1
-            if row.get('Status') == 'Failed':
-                failed.append({
-                    'date': row['Date (UTC)'],
-                    'vendor': row['Description'],
-                    'amount': row['Amount'],
-                    'source': row.get('Source Account', ''),
-                    'note': row.get('Note', '')
-                })
-        
-        print(f'FAILED TRANSACTIONS ANALYSIS')
-        print('=' * 80)
-        print(f'Total transactions: {total_count}')
-        print(f'Failed transactions: {len(failed)} ({len(failed)/total_count*100:.1f}%)')
-        
-        # Group by vendor
-        by_vendor = {}
-        for f in failed:
-            vendor = f['vendor']
-            if vendor not in by_vendor:
-                by_vendor[vendor] = []
-            by_vendor[vendor].append(f)
-        
-        # Show summary
-        print(f'\nTop 10 vendors with failed transactions:')
-        print('-' * 60)
-        for vendor, transactions in sorted(by_vendor.items(), key=lambda x: len(x[1]), reverse=True)[:10]:
-            amounts = []
-            for t in transactions:
-                try:
-                    amt = float(t['amount'].replace(',',''))
-                    amounts.append(amt)
-                except:
-                    pass
-            
-            total = sum(abs(a) for a in amounts)
-            print(f'\n{vendor}:')
-            print(f'  Failed count: {len(transactions)}')
-            print(f'  Total amount: ${total:,.0f}')
-            
-            # Show first few examples
-            for t in transactions[:2]:
-                print(f'  - {t["date"]}: {t["amount"]} ({t["source"]})')
+    df = pd.read_csv(
+        'BS_mercury_transactions.csv',
+        usecols=lambda c: c in CSV_COLUMNS,
+        # Vendor names repeat heavily, so Description is stored as integer codes
+        dtype={'Description': 'category', 'Status': str, 'Source Account': str},
+        thousands=',',
+    )
+    # Non-numeric amounts become NaN and drop out of the totals
+    df['Amount'] = pd.to_numeric(df['Amount'], errors='coerce')
+    if 'Source Account' not in df:
+        df['Source Account'] = ''
+
+    total_count = len(df)
+    failed = df[df['Status'] == 'Failed']
+
+    print(f'FAILED TRANSACTIONS ANALYSIS')
+    print('=' * 80)
+    print(f'Total transactions: {total_count}')
+    print(f'Failed transactions: {len(failed)} ({len(failed)/total_count*100:.1f}%)')
+
+    # Group by vendor
+    # Absolute amounts up front so the total is a built-in sum, not a Python lambda
+    by_vendor = failed.assign(amt_abs=failed['Amount'].abs()).groupby(
+        'Description', sort=False, observed=True
+    ).agg(
+        count=('Amount', 'size'),
+        total=('amt_abs', 'sum'),
+    )
+    top_vendors = by_vendor.nlargest(10, 'count', keep='first')
+    examples = failed[failed['Description'].isin(top_vendors.index)].groupby('Description', observed=True).head(2)
+
+    # Show summary
+    print(f'\nTop 10 vendors with failed transactions:')
+    print('-' * 60)
+    for vendor, count, total in zip(top_vendors.index, top_vendors['count'], top_vendors['total']):
+        print(f'\n{vendor}:')
+        print(f'  Failed count: {count}')
+        print(f'  Total amount: ${total:,.0f}')
+
+        # Show first few examples
+        sample = examples[examples['Description'] == vendor]
+        for date, amount, source in zip(sample['Date (UTC)'], sample['Amount'], sample['Source Account'].fillna('')):
+            print(f'  - {date}: {amount:,.2f} ({source})')
 
 if __name__ == '__main__':
-    analyze_failed_transactions()
\ No newline at end of file
+    with buffered_stdout():
+        analyze_failed_transactions()
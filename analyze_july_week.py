@@ -5,9 +5,10 @@ This script will be ready to run once the July 2025 data is imported.
 
 import pandas as pd
 from datetime import datetime, timedelta
-from collections import defaultdict
 from supabase_client import supabase
+from services.transaction_service import get_transaction_service
 from weekly_pivot_analysis import create_weekly_pivot_analysis, export_to_csv
+from utils.buffered_output import buffered_stdout
 
 def analyze_july_week_bestself():
     """
@@ -28,15 +29,14 @@ def analyze_july_week_bestself():
     try:
         # Step 1: Check if we have data for this period
         print("Step 1: Checking data availability...")
-        result = supabase.table('transactions') \
-            .select('transaction_date, vendor_name, amount, description') \
-            .eq('client_id', client_id) \
-            .gte('transaction_date', target_start) \
-            .lte('transaction_date', target_end) \
-            .order('transaction_date') \
-            .execute()
+        df = get_transaction_service().fetch_transactions_frame(
+            client_id,
+            columns=('transaction_date', 'vendor_name', 'amount', 'description'),
+            start_date=target_start,
+            end_date=target_end
+        )
         
-        if not result.data:
+        if df.empty:
             print(f"❌ No transactions found for July 21-27, 2025")
             
             # Check what data we do have
@@ -55,24 +55,25 @@ def analyze_july_week_bestself():
             
             return None
         
-        transactions = result.data
-        print(f"✅ Found {len(transactions)} transactions for July 21-27, 2025")
+        print(f"✅ Found {len(df)} transactions for July 21-27, 2025")
         
         # Step 2: Show sample transactions
         print(f"\nStep 2: Sample transactions from July 21-27, 2025:")
         print("-" * 80)
-        df = pd.DataFrame(transactions)
-        df['transaction_date'] = pd.to_datetime(df['transaction_date'])
         df_sorted = df.sort_values(['transaction_date', 'amount'], ascending=[True, False])
         
         print(f"{'Date':<12} | {'Amount':>12} | {'Vendor':<30} | {'Description'}")
         print("-" * 80)
         
-        for i, (_, txn) in enumerate(df_sorted.head(15).iterrows()):
-            date_str = txn['transaction_date'].strftime('%Y-%m-%d')
-            vendor = (txn['vendor_name'] or 'Unknown')[:30]
-            description = (txn['description'] or '')[:40]
-            print(f"{date_str} | ${txn['amount']:>11,.2f} | {vendor:<30} | {description}")
+        sample = df_sorted.head(15)
+        dates = sample['transaction_date'].dt.strftime('%Y-%m-%d').to_numpy()
+        amounts = sample['amount'].to_numpy()
+        vendors = sample['vendor_name'].fillna('Unknown').str[:30].to_numpy()
+        descriptions = sample['description'].fillna('').str[:40].to_numpy()
+        print("\n".join(
+            f"{d} | ${a:>11,.2f} | {v:<30} | {desc}"
+            for d, a, v, desc in zip(dates, amounts, vendors, descriptions)
+        ))
         
         if len(df_sorted) > 15:
             print(f"... and {len(df_sorted) - 15} more transactions")
@@ -92,42 +93,36 @@ def analyze_july_week_bestself():
             print(f"\nStep 4: Deposits vs Withdrawals Summary by Vendor:")
             print("=" * 80)
             
-            vendor_summary = defaultdict(lambda: {'deposits': 0, 'withdrawals': 0, 'net': 0, 'count': 0})
-            
-            for txn in transactions:
-                vendor = txn.get('vendor_name', 'Unknown')
-                amount = float(txn['amount'])
-                
-                vendor_summary[vendor]['count'] += 1
-                vendor_summary[vendor]['net'] += amount
-                
-                if amount > 0:
-                    vendor_summary[vendor]['deposits'] += amount
-                else:
-                    vendor_summary[vendor]['withdrawals'] += abs(amount)
-            
-            # Sort by total activity (deposits + withdrawals)
-            sorted_vendors = sorted(
-                vendor_summary.items(),
-                key=lambda x: x[1]['deposits'] + x[1]['withdrawals'],
-                reverse=True
+            amounts = df['amount']
+            summary = df.assign(
+                vendor_name=df['vendor_name'].fillna('Unknown'),
+                deposit=amounts.where(amounts > 0, 0.0),
+                withdrawal=(-amounts).where(amounts < 0, 0.0)
+            ).groupby('vendor_name', sort=False).agg(
+                deposits=('deposit', 'sum'),
+                withdrawals=('withdrawal', 'sum'),
+                net=('amount', 'sum'),
+                count=('amount', 'size')
             )
             
+            summary = summary.assign(activity=summary['deposits'] + summary['withdrawals'])
+            
             print(f"{'Vendor':<25} | {'Deposits':>12} | {'Withdrawals':>12} | {'Net':>12} | {'Count':>6}")
             print("-" * 80)
             
-            total_deposits = 0
-            total_withdrawals = 0
-            total_transactions = 0
+            # Only show significant activity, ordered by total activity (deposits + withdrawals);
+            # only the filtered rows get ranked
+            significant = summary[summary['activity'] > 1]
+            significant = significant.nlargest(len(significant), 'activity', keep='first')
+            for vendor, deposits, withdrawals, net, count in zip(
+                significant.index, significant['deposits'], significant['withdrawals'],
+                significant['net'], significant['count']
+            ):
+                print(f"{vendor[:24]:<25} | ${deposits:>11,.2f} | ${withdrawals:>11,.2f} | ${net:>11,.2f} | {count:>6}")
             
-            for vendor, data in sorted_vendors:
-                if data['deposits'] + data['withdrawals'] > 1:  # Only show significant activity
-                    vendor_short = vendor[:24]
-                    print(f"{vendor_short:<25} | ${data['deposits']:>11,.2f} | ${data['withdrawals']:>11,.2f} | ${data['net']:>11,.2f} | {data['count']:>6}")
-                    
-                    total_deposits += data['deposits']
-                    total_withdrawals += data['withdrawals']
-                    total_transactions += data['count']
+            total_deposits = significant['deposits'].sum()
+            total_withdrawals = significant['withdrawals'].sum()
+            total_transactions = int(significant['count'].sum())
             
             print("-" * 80)
             net_total = total_deposits - total_withdrawals
@@ -137,8 +132,8 @@ def analyze_july_week_bestself():
             print(f"\nStep 5: Week Summary:")
             print("=" * 40)
             print(f"Analysis Period:     {target_start} to {target_end}")
-            print(f"Total Transactions:  {len(transactions)}")
-            print(f"Unique Vendors:      {len([v for v, d in vendor_summary.items() if d['count'] > 0])}")
+            print(f"Total Transactions:  {len(df)}")
+            print(f"Unique Vendors:      {len(summary)}")
             print(f"Total Deposits:      ${total_deposits:,.2f}")
             print(f"Total Withdrawals:   ${total_withdrawals:,.2f}")
             print(f"Net Cash Flow:       ${net_total:,.2f}")
@@ -147,13 +142,13 @@ def analyze_july_week_bestself():
             print(f"Daily Average Flow:  ${net_total/7:,.2f}")
             
             return {
-                'transactions': transactions,
-                'vendor_summary': dict(vendor_summary),
+                'transactions': df.to_dict('records'),
+                'vendor_summary': summary.drop(columns='activity').to_dict('index'),
                 'totals': {
                     'deposits': total_deposits,
                     'withdrawals': total_withdrawals,
                     'net': net_total,
-                    'count': len(transactions)
+                    'count': len(df)
                 }
             }
         
@@ -197,16 +192,17 @@ def check_data_availability():
         return False
 
 if __name__ == "__main__":
-    print("🔍 Checking if July 2025 data is available...")
+    with buffered_stdout():
+        print("🔍 Checking if July 2025 data is available...")
     
-    if check_data_availability():
-        print("\n" + "="*80)
-        analyze_july_week_bestself()
-    else:
-        print("\n💡 This script is ready to run once July 2025 data is imported.")
-        print("   The analysis will include:")
-        print("   • Date range verification")
-        print("   • Sample transactions display")
-        print("   • Comprehensive pivot table")
-        print("   • Deposits vs withdrawals by vendor")
-        print("   • Export to CSV for further analysis")
\ No newline at end of file
+        if check_data_availability():
+            print("\n" + "="*80)
+            analyze_july_week_bestself()
+        else:
+            print("\n💡 This script is ready to run once July 2025 data is imported.")
+            print("   The analysis will include:")
+            print("   • Date range verification")
+            print("   • Sample transactions display")
+            print("   • Comprehensive pivot table")
+            print("   • Deposits vs withdrawals by vendor")
+            print("   • Export to CSV for further analysis")
\ No newline at end of file
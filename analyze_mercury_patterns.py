@@ -12,11 +12,71 @@ Compares actual transaction data with user's forecast:
 - TikTok: $30-160 weekly
 """
 
-from supabase_client import supabase
+from services.transaction_service import get_transaction_service
 from datetime import datetime, date, timedelta
+import numpy as np
 import pandas as pd
 from collections import defaultdict
 import re
+from utils.numba_compat import njit
+from utils.frame_cache import cached_frame
+from utils.buffered_output import buffered_stdout
+
+# Major vendors mentioned in the forecast and the keywords that identify them
+VENDOR_PATTERNS = {
+    'Amazon L': ['amazon', 'amzn'],
+    'Shopify': ['shopify', 'shop'],
+    'Amazon CA': ['amazon.ca', 'amazon ca'],
+    'Amazon': ['amazon', 'amzn'],
+    'PayPal': ['paypal', 'pp '],
+    'Stripe': ['stripe'],
+    'TikTok': ['tiktok', 'bytedance']
+}
+
+def compile_vendor_scanner(vendor_patterns):
+    """
+    Build the single-pass keyword scanner for vendor_patterns.
+    
+    Returns (scanner, keyword_bits) where keyword_bits maps each matched
+    keyword to the bitmask of vendors it identifies.
+    """
+    keywords = sorted({kw for kws in vendor_patterns.values() for kw in kws}, key=len, reverse=True)
+    # Lookahead reports a match at every position; longest keywords win ties
+    scanner = re.compile('(?=(' + '|'.join(map(re.escape, keywords)) + '))')
+    
+    # A matched keyword also implies every keyword it contains (e.g. 'amazon.ca' → 'amazon')
+    keyword_bits = {
+        kw: sum(1 << i for i, kws in enumerate(vendor_patterns.values()) if any(k in kw for k in kws))
+        for kw in keywords
+    }
+    return scanner, keyword_bits
+
+# Compiled once at import rather than on every analysis run
+VENDOR_SCANNER, VENDOR_KEYWORD_BITS = compile_vendor_scanner(VENDOR_PATTERNS)
+
+def label_vendor_matches(haystack, scanner=VENDOR_SCANNER, keyword_bits=VENDOR_KEYWORD_BITS):
+    """
+    Scan each lowercase text once and return an int64 bitmask per row where
+    bit i is set if any keyword of the i-th vendor in VENDOR_PATTERNS occurs.
+    """
+    finditer = scanner.finditer
+    masks = np.zeros(len(haystack), dtype=np.int64)
+    for row, text in enumerate(haystack):
+        bits = 0
+        for match in finditer(text):
+            bits |= keyword_bits[match.group(1)]
+        masks[row] = bits
+    return masks
+
+@cached_frame()
+def fetch_income_frame(client_id, start_date):
+    """Income transactions since start_date, oldest first (cached on disk for an hour)."""
+    return get_transaction_service().fetch_transactions_frame(
+        client_id,
+        columns=('transaction_date', 'vendor_name', 'amount', 'description'),
+        start_date=start_date,
+        income_only=True
+    )
 
 def analyze_mercury_patterns():
     """Analyze Mercury transaction patterns for bestself client."""
@@ -26,67 +86,40 @@ def analyze_mercury_patterns():
         print("🔍 MERCURY TRANSACTION PATTERN ANALYSIS FOR BESTSELF CLIENT")
         print("=" * 80)
         
-        # Get all transactions for the last 6 months
+        # Get income transactions for the last 6 months (amount > 0 filtered server-side).
+        # Fetched oldest-first once so every per-vendor slice below is already sorted.
         six_months_ago = (datetime.now() - timedelta(days=180)).date()
         
-        result = supabase.table('transactions') \
-            .select('transaction_date, vendor_name, amount, description') \
-            .eq('client_id', client_id) \
-            .gte('transaction_date', six_months_ago.isoformat()) \
-            .order('transaction_date', desc=True) \
-            .execute()
+        income_df = fetch_income_frame(client_id, six_months_ago.isoformat())
         
-        if not result.data:
+        if income_df.empty:
             print(f"❌ No transactions found for client: {client_id}")
             return None
         
-        transactions = result.data
-        print(f"✅ Found {len(transactions)} transactions since {six_months_ago}")
-        
-        # Convert to DataFrame
-        df = pd.DataFrame(transactions)
-        df['transaction_date'] = pd.to_datetime(df['transaction_date'])
-        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-        
-        # Filter for positive amounts (income only)
-        income_df = df[df['amount'] > 0].copy()
-        
-        print(f"💰 Found {len(income_df)} income transactions")
+        print(f"💰 Found {len(income_df)} income transactions since {six_months_ago}")
         print(f"📅 Date range: {income_df['transaction_date'].min().strftime('%Y-%m-%d')} to {income_df['transaction_date'].max().strftime('%Y-%m-%d')}")
         
-        # Analyze major vendors mentioned in forecast
-        vendor_patterns = {
-            'Amazon L': ['amazon', 'amzn'],
-            'Shopify': ['shopify', 'shop'],
-            'Amazon CA': ['amazon.ca', 'amazon ca'],
-            'Amazon': ['amazon', 'amzn'],
-            'PayPal': ['paypal', 'pp '],
-            'Stripe': ['stripe'],
-            'TikTok': ['tiktok', 'bytedance']
-        }
-        
         print("\n🎯 ANALYZING VENDOR PATTERNS")
         print("=" * 80)
         
         vendor_analysis = {}
         
-        for forecast_vendor, keywords in vendor_patterns.items():
+        # Label every row with a bitmask of matching vendors in one scan
+        haystack = (income_df['vendor_name'].fillna('') + '\x1f' +
+                    income_df['description'].fillna('')).str.lower()
+        vendor_masks = label_vendor_matches(haystack.to_numpy())
+        
+        for vendor_id, forecast_vendor in enumerate(VENDOR_PATTERNS):
             print(f"\n📊 {forecast_vendor.upper()} ANALYSIS:")
             print("-" * 50)
             
             # Find matching transactions
-            vendor_txns = income_df[
-                income_df['vendor_name'].str.contains('|'.join(keywords), case=False, na=False) |
-                income_df['description'].str.contains('|'.join(keywords), case=False, na=False)
-            ].copy()
+            vendor_txns = income_df[(vendor_masks >> vendor_id) & 1 == 1].copy()
             
             if len(vendor_txns) == 0:
                 print(f"❌ No transactions found for {forecast_vendor}")
                 continue
             
-            # Sort by date
-            vendor_txns = vendor_txns.sort_values('transaction_date')
-            
             print(f"✅ Found {len(vendor_txns)} transactions")
             print(f"💰 Total amount: ${vendor_txns['amount'].sum():,.2f}")
             print(f"📈 Average per transaction: ${vendor_txns['amount'].mean():,.2f}")
@@ -95,8 +128,10 @@ def analyze_mercury_patterns():
             # Show recent transactions
             print(f"\n🔍 Recent transactions (last 10):")
             recent = vendor_txns.tail(10)
-            for _, txn in recent.iterrows():
-                print(f"  {txn['transaction_date'].strftime('%Y-%m-%d')} | ${txn['amount']:>10,.2f} | {txn['vendor_name'][:40]}")
+            dates = recent['transaction_date'].dt.strftime('%Y-%m-%d').to_numpy()
+            amounts = recent['amount'].to_numpy()
+            vendors = recent['vendor_name'].str[:40].to_numpy()
+            print("\n".join(f"  {d} | ${a:>10,.2f} | {v}" for d, a, v in zip(dates, amounts, vendors)))
             
             # Analyze patterns
             analyze_vendor_patterns(vendor_txns, forecast_vendor)
@@ -123,37 +158,61 @@ def analyze_mercury_patterns():
         traceback.print_exc()
         return None
 
+# Eager signature: compiled (or loaded from the on-disk cache) at import, not on first call
+@njit('Tuple((i8, i8, i8, f8, f8, f8, f8))(f8[:])', cache=True)
+def classify_intervals(gaps):
+    """
+    One pass over the gap array: counts of ~weekly (5-9), ~bi-weekly (11-17)
+    and ~monthly (25-35) gaps plus min, max, mean and sample std.
+    """
+    n = len(gaps)
+    weekly = biweekly = monthly = 0
+    gap_min = gap_max = gaps[0]
+    total = 0.0
+    total_sq = 0.0
+    for g in gaps:
+        if 5 <= g <= 9:
+            weekly += 1
+        if 11 <= g <= 17:
+            biweekly += 1
+        if 25 <= g <= 35:
+            monthly += 1
+        gap_min = min(gap_min, g)
+        gap_max = max(gap_max, g)
+        total += g
+        total_sq += g * g
+    mean = total / n
+    std = np.sqrt(max(total_sq - n * mean * mean, 0.0) / (n - 1)) if n > 1 else np.nan
+    return weekly, biweekly, monthly, gap_min, gap_max, mean, std
+
 def analyze_vendor_patterns(vendor_txns, vendor_name):
-    """Analyze specific patterns for a vendor."""
+    """Analyze specific patterns for a vendor (vendor_txns sorted by date)."""
     if len(vendor_txns) < 2:
         return
     
     print(f"\n🔍 Pattern Analysis for {vendor_name}:")
     
-    # Calculate days between transactions
-    vendor_txns = vendor_txns.sort_values('transaction_date')
-    vendor_txns['days_since_last'] = vendor_txns['transaction_date'].diff().dt.days
-    
-    # Remove NaN (first transaction)
-    intervals = vendor_txns['days_since_last'].dropna()
+    # Calculate days between transactions (vendor_txns is already date-sorted)
+    days = vendor_txns['transaction_date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    intervals = np.diff(days).astype(np.float64)
     
     if len(intervals) > 0:
-        print(f"  📊 Transaction intervals (days): {intervals.describe()}")
+        weekly_hits, biweekly_hits, monthly_hits, gap_min, gap_max, gap_mean, gap_std = classify_intervals(intervals)
+        n = len(intervals)
+        print(f"  📊 Transaction intervals (days): count={n}, mean={gap_mean:.1f}, std={gap_std:.1f}, "
+              f"min={gap_min:.0f}, median={np.median(intervals):.1f}, max={gap_max:.0f}")
         
         # Check for weekly pattern (7 days ± 2)
-        weekly_pattern = intervals[(intervals >= 5) & (intervals <= 9)]
-        if len(weekly_pattern) > len(intervals) * 0.5:
-            print(f"  ✅ Weekly pattern detected: {len(weekly_pattern)}/{len(intervals)} transactions are ~7 days apart")
+        if weekly_hits > n * 0.5:
+            print(f"  ✅ Weekly pattern detected: {weekly_hits}/{n} transactions are ~7 days apart")
         
         # Check for bi-weekly pattern (14 days ± 3)
-        biweekly_pattern = intervals[(intervals >= 11) & (intervals <= 17)]
-        if len(biweekly_pattern) > len(intervals) * 0.3:
-            print(f"  ✅ Bi-weekly pattern detected: {len(biweekly_pattern)}/{len(intervals)} transactions are ~14 days apart")
+        if biweekly_hits > n * 0.3:
+            print(f"  ✅ Bi-weekly pattern detected: {biweekly_hits}/{n} transactions are ~14 days apart")
         
         # Check for monthly pattern (28-31 days)
-        monthly_pattern = intervals[(intervals >= 25) & (intervals <= 35)]
-        if len(monthly_pattern) > len(intervals) * 0.3:
-            print(f"  ✅ Monthly pattern detected: {len(monthly_pattern)}/{len(intervals)} transactions are ~30 days apart")
+        if monthly_hits > n * 0.3:
+            print(f"  ✅ Monthly pattern detected: {monthly_hits}/{n} transactions are ~30 days apart")
     
     # Amount patterns
     amounts = vendor_txns['amount']
@@ -164,24 +223,34 @@ def analyze_vendor_patterns(vendor_txns, vendor_name):
     print(f"    Std Dev: ${amounts.std():,.2f}")
     
     # Check for consistent amounts
-    amount_groups = amounts.round(-2).value_counts()  # Round to nearest $100
-    if len(amount_groups) <= 5:
+    buckets = np.rint(amounts.to_numpy() / 100).astype(np.int64)  # Round to nearest $100
+    bucket_values, bucket_counts = np.unique(buckets, return_counts=True)
+    if len(bucket_values) <= 5:
         print(f"  📈 Common amounts:")
-        for amount, count in amount_groups.head().items():
-            print(f"    ~${amount:,.0f}: {count} times")
+        for i in np.argsort(-bucket_counts, kind='stable'):
+            print(f"    ~${bucket_values[i] * 100:,.0f}: {bucket_counts[i]} times")
+
+def monday_week_start(dates):
+    """Monday of each date's week, via integer day arithmetic instead of Period objects."""
+    days = dates.to_numpy().astype('datetime64[D]').astype(np.int64)
+    # 1970-01-01 was a Thursday, so (days + 3) % 7 is the weekday with Monday = 0
+    week_start = (days - (days + 3) % 7).astype('datetime64[D]')
+    return pd.Series(week_start.astype('datetime64[ns]'), index=dates.index)
 
 def analyze_weekly_patterns(income_df, vendor_analysis):
     """Analyze weekly patterns for all vendors."""
     
     # Group by week
-    income_df['week_start'] = income_df['transaction_date'].dt.to_period('W').dt.start_time
-    weekly_totals = income_df.groupby('week_start')['amount'].sum().reset_index()
+    income_df['week_start'] = monday_week_start(income_df['transaction_date'])
+    weekly_totals = income_df.groupby('week_start', sort=False)['amount'].sum().reset_index()
     weekly_totals = weekly_totals.sort_values('week_start', ascending=False)
     
     print(f"📅 Weekly totals for last 8 weeks:")
-    for _, week in weekly_totals.head(8).iterrows():
-        week_end = week['week_start'] + timedelta(days=6)
-        print(f"  {week['week_start'].strftime('%Y-%m-%d')} to {week_end.strftime('%Y-%m-%d')}: ${week['amount']:>10,.2f}")
+    top_weeks = weekly_totals.head(8)
+    starts = top_weeks['week_start'].dt.strftime('%Y-%m-%d').to_numpy()
+    ends = (top_weeks['week_start'] + timedelta(days=6)).dt.strftime('%Y-%m-%d').to_numpy()
+    amounts = top_weeks['amount'].to_numpy()
+    print("\n".join(f"  {s} to {e}: ${a:>10,.2f}" for s, e, a in zip(starts, ends, amounts)))
     
     # Analyze each vendor's weekly patterns
     for vendor_name, vendor_txns in vendor_analysis.items():
@@ -189,13 +258,15 @@ def analyze_weekly_patterns(income_df, vendor_analysis):
             continue
             
         print(f"\n📊 {vendor_name} Weekly Breakdown:")
-        vendor_txns['week_start'] = vendor_txns['transaction_date'].dt.to_period('W').dt.start_time
-        vendor_weekly = vendor_txns.groupby('week_start')['amount'].sum().reset_index()
+        vendor_txns['week_start'] = monday_week_start(vendor_txns['transaction_date'])
+        vendor_weekly = vendor_txns.groupby('week_start', sort=False)['amount'].sum().reset_index()
         vendor_weekly = vendor_weekly.sort_values('week_start', ascending=False)
         
-        for _, week in vendor_weekly.head(6).iterrows():
-            week_end = week['week_start'] + timedelta(days=6)
-            print(f"    {week['week_start'].strftime('%m-%d')} to {week_end.strftime('%m-%d')}: ${week['amount']:>8,.2f}")
+        top_weeks = vendor_weekly.head(6)
+        starts = top_weeks['week_start'].dt.strftime('%m-%d').to_numpy()
+        ends = (top_weeks['week_start'] + timedelta(days=6)).dt.strftime('%m-%d').to_numpy()
+        amounts = top_weeks['amount'].to_numpy()
+        print("\n".join(f"    {s} to {e}: ${a:>8,.2f}" for s, e, a in zip(starts, ends, amounts)))
 
 def compare_with_forecast(vendor_analysis):
     """Compare actual patterns with user's forecast numbers."""
@@ -244,4 +315,5 @@ def compare_with_forecast(vendor_analysis):
             print(f"  ❌ No actual transactions found")
 
 if __name__ == "__main__":
-    analyze_mercury_patterns()
\ No newline at end of file
+    with buffered_stdout():
+        analyze_mercury_patterns()
\ No newline at end of file
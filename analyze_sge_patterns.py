@@ -7,6 +7,20 @@ from supabase_client import supabase
 from datetime import datetime, date, timedelta
 import pandas as pd
 
+def print_sge_transactions(txns):
+    """Print one line per transaction (absolute amount), plus its description when it adds anything."""
+    lines = []
+    for txn_date, amount, vendor, description in zip(
+        txns['transaction_date'].dt.strftime('%Y-%m-%d'),
+        txns['amount'].abs(),
+        txns['vendor_name'],
+        txns['description']
+    ):
+        lines.append(f"  {txn_date} | ${amount:>10,.2f} | {vendor}")
+        if description and description != vendor:
+            lines.append(f"    Description: {description}")
+    print("\n".join(lines))
+
 def analyze_sge_patterns():
     """Analyze SGE transaction patterns."""
     client_id = 'spyguy'
@@ -15,13 +29,15 @@ def analyze_sge_patterns():
         print("🔍 ANALYZING SGE TRANSACTION PATTERNS")
         print("=" * 60)
         
-        # Get all transactions for the last 6 months
+        # Get SGE transactions for the last 6 months; the substring match
+        # runs in Postgres so only matching rows are transferred
         six_months_ago = (datetime.now() - timedelta(days=180)).date()
         
         result = supabase.table('transactions') \
             .select('transaction_date, vendor_name, amount, description') \
             .eq('client_id', client_id) \
             .gte('transaction_date', six_months_ago.isoformat()) \
+            .or_('vendor_name.ilike.*SGE*,description.ilike.*SGE*') \
             .order('transaction_date', desc=True) \
             .execute()
         
@@ -29,16 +45,9 @@ def analyze_sge_patterns():
             print(f"❌ No transactions found")
             return None
         
-        transactions = result.data
-        df = pd.DataFrame(transactions)
-        df['transaction_date'] = pd.to_datetime(df['transaction_date'])
-        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-        
-        # Search for SGE transactions
-        sge_transactions = df[
-            df['vendor_name'].str.contains('SGE', case=False, na=False) |
-            df['description'].str.contains('SGE', case=False, na=False)
-        ].copy()
+        sge_transactions = pd.DataFrame(result.data)
+        sge_transactions['transaction_date'] = pd.to_datetime(sge_transactions['transaction_date'], format='%Y-%m-%d', cache=True)
+        sge_transactions['amount'] = pd.to_numeric(sge_transactions['amount'], errors='coerce')
         
         print(f"✅ Found {len(sge_transactions)} SGE transactions")
         
@@ -64,37 +73,35 @@ def analyze_sge_patterns():
             print(f"📅 Date range: {sge_income['transaction_date'].min().strftime('%Y-%m-%d')} to {sge_income['transaction_date'].max().strftime('%Y-%m-%d')}")
             
             print(f"\n🔍 All SGE Income transactions:")
-            for _, txn in sge_income.iterrows():
-                print(f"  {txn['transaction_date'].strftime('%Y-%m-%d')} | ${txn['amount']:>10,.2f} | {txn['vendor_name']}")
-                if txn['description'] and txn['description'] != txn['vendor_name']:
-                    print(f"    Description: {txn['description']}")
+            print_sge_transactions(sge_income)
+            
+            # Day gaps between consecutive deposits, computed once and reused for the
+            # interval listing, the pattern buckets and the weekly span below
+            gaps = sge_income['transaction_date'].diff().dt.days.to_numpy()[1:]
             
             # Analyze intervals
-            if len(sge_income) > 1:
-                sge_income['days_between'] = sge_income['transaction_date'].diff().dt.days
-                intervals = sge_income['days_between'].dropna()
-                
+            if len(gaps) > 0:
                 print(f"\n📊 Intervals between SGE income transactions:")
-                for i, (_, txn) in enumerate(sge_income.iterrows()):
-                    if pd.notna(txn['days_between']):
-                        print(f"  Transaction {i+1}: {txn['days_between']:.0f} days after previous")
+                print("\n".join(
+                    f"  Transaction {i}: {days:.0f} days after previous"
+                    for i, days in enumerate(gaps, start=2)
+                ))
+                
+                avg_interval = gaps.mean()
+                print(f"\n📈 Average interval: {avg_interval:.1f} days")
+                
+                # Check for patterns
+                weekly_count = int(((gaps >= 5) & (gaps <= 9)).sum())
+                biweekly_count = int(((gaps >= 12) & (gaps <= 16)).sum())
+                monthly_count = int(((gaps >= 25) & (gaps <= 35)).sum())
+                
+                print(f"📊 Pattern analysis:")
+                print(f"  Weekly pattern (5-9 days): {weekly_count}/{len(gaps)} transactions")
+                print(f"  Bi-weekly pattern (12-16 days): {biweekly_count}/{len(gaps)} transactions")
+                print(f"  Monthly pattern (25-35 days): {monthly_count}/{len(gaps)} transactions")
                 
-                if len(intervals) > 0:
-                    avg_interval = intervals.mean()
-                    print(f"\n📈 Average interval: {avg_interval:.1f} days")
-                    
-                    # Check for patterns
-                    weekly_count = sum(1 for x in intervals if 5 <= x <= 9)
-                    biweekly_count = sum(1 for x in intervals if 12 <= x <= 16)
-                    monthly_count = sum(1 for x in intervals if 25 <= x <= 35)
-                    
-                    print(f"📊 Pattern analysis:")
-                    print(f"  Weekly pattern (5-9 days): {weekly_count}/{len(intervals)} transactions")
-                    print(f"  Bi-weekly pattern (12-16 days): {biweekly_count}/{len(intervals)} transactions")
-                    print(f"  Monthly pattern (25-35 days): {monthly_count}/{len(intervals)} transactions")
-                    
-                    if biweekly_count > 0:
-                        print(f"  ✅ Bi-weekly pattern detected!")
+                if biweekly_count > 0:
+                    print(f"  ✅ Bi-weekly pattern detected!")
             
             # Check if these could be the $44k Amazon deposits
             print(f"\n🎯 COMPARISON WITH FORECAST:")
@@ -102,7 +109,8 @@ def analyze_sge_patterns():
             print(f"User's forecast: $44,777 bi-weekly from 'Amazon L'")
             
             # Calculate what the SGE pattern would be
-            weeks_span = (sge_income['transaction_date'].max() - sge_income['transaction_date'].min()).days / 7
+            # Gaps of a date-sorted series sum to the max - min span
+            weeks_span = gaps.sum() / 7
             if weeks_span > 0:
                 weekly_avg = sge_income['amount'].sum() / weeks_span
                 biweekly_projection = weekly_avg * 2
@@ -128,10 +136,7 @@ def analyze_sge_patterns():
             print(f"📉 Average per transaction: ${abs(sge_expenses['amount'].mean()):,.2f}")
             
             print(f"\n🔍 All SGE Expense transactions:")
-            for _, txn in sge_expenses.iterrows():
-                print(f"  {txn['transaction_date'].strftime('%Y-%m-%d')} | ${abs(txn['amount']):>10,.2f} | {txn['vendor_name']}")
-                if txn['description'] and txn['description'] != txn['vendor_name']:
-                    print(f"    Description: {txn['description']}")
+            print_sge_transactions(sge_expenses)
         
         return sge_transactions
         
@@ -7,67 +7,141 @@ import sys
 sys.path.append('.')
 
 from supabase_client import supabase
-from datetime import datetime
-from collections import defaultdict
-import statistics
+from services.transaction_service import get_transaction_service
+import numpy as np
+import pandas as pd
+from utils.numba_compat import njit
 
-# Get vendor data
-result = supabase.table('transactions').select('vendor_name, amount, transaction_date').eq('client_id', 'spyguy').execute()
-transactions = result.data
+# Pattern windows on the average gap in days, inclusive at both ends.
+# Codes index PATTERN_LABELS; 0 means no window matched.
+PATTERN_LABELS = ("UNKNOWN", "DAILY/FREQUENT", "WEEKLY", "BI-WEEKLY", "MONTHLY", "QUARTERLY")
 
-# Group by vendor
-vendor_data = defaultdict(list)
-for txn in transactions:
-    vendor_data[txn['vendor_name']].append(txn)
+# Gaps per rolling window, and how many recent windows decide the current pattern
+ROLLING_WINDOW = 4
+RECENT_WINDOWS = 8
 
-print('TOP VENDORS WITH TRANSACTION PATTERNS:')
-print('=' * 80)
+# Eager signatures: compiled (or loaded from the on-disk cache) at import, not on first call
+@njit('i8(f8)', cache=True)
+def pattern_code(avg_gap):
+    """Index into PATTERN_LABELS for an average gap in days."""
+    if avg_gap < 5:
+        return 1
+    elif 6 <= avg_gap <= 8:
+        return 2
+    elif 13 <= avg_gap <= 15:
+        return 3
+    elif 28 <= avg_gap <= 32:
+        return 4
+    elif 85 <= avg_gap <= 95:
+        return 5
+    return 0
 
-# Analyze top vendors
-for vendor_name, txns in sorted(vendor_data.items(), key=lambda x: len(x[1]), reverse=True)[:15]:
-    if len(txns) < 3:  # Need at least 3 for pattern
-        continue
+@njit('Tuple((f8, f8, f8, f8, i8))(i8[:], f8[:])', cache=True)
+def classify_vendor(days, amounts):
+    """
+    Gap and amount statistics for one vendor in a single compiled pass.
     
-    # Get dates and amounts
-    txns_sorted = sorted(txns, key=lambda x: x['transaction_date'])
-    dates = [datetime.fromisoformat(t['transaction_date']).date() for t in txns_sorted]
-    amounts = [abs(float(t['amount'])) for t in txns_sorted]
+    days are int64 epoch days sorted ascending, amounts are absolute float64
+    values in the same order. Returns (avg_gap, median_gap, gap_std,
+    amount_cv, pattern_code) using sample standard deviations.
+    """
+    n = days.shape[0]
+    gaps = np.empty(n - 1, dtype=np.float64)
     
-    # Calculate gaps between consecutive transactions
-    gaps = []
-    for i in range(1, len(dates)):
-        gap_days = (dates[i] - dates[i-1]).days
-        gaps.append(gap_days)
+    # Welford's running mean/variance over gaps and amounts together
+    gap_mean = 0.0
+    gap_m2 = 0.0
+    amt_mean = amounts[0]
+    amt_m2 = 0.0
+    for i in range(1, n):
+        gap = float(days[i] - days[i - 1])
+        gaps[i - 1] = gap
+        delta = gap - gap_mean
+        gap_mean += delta / i
+        gap_m2 += delta * (gap - gap_mean)
+        
+        delta = amounts[i] - amt_mean
+        amt_mean += delta / (i + 1)
+        amt_m2 += delta * (amounts[i] - amt_mean)
     
-    # Statistics
-    avg_gap = statistics.mean(gaps) if gaps else 0
-    median_gap = statistics.median(gaps) if gaps else 0
-    gap_std = statistics.stdev(gaps) if len(gaps) > 1 else 0
+    median_gap = np.median(gaps) if n > 1 else 0.0
+    gap_std = np.sqrt(gap_m2 / (n - 2)) if n > 2 else 0.0
+    amt_std = np.sqrt(amt_m2 / (n - 1)) if n > 1 else 0.0
+    amount_cv = amt_std / amt_mean if amt_mean > 0 else 0.0
     
-    avg_amount = statistics.mean(amounts)
-    amount_std = statistics.stdev(amounts) if len(amounts) > 1 else 0
-    amount_cv = amount_std / avg_amount if avg_amount > 0 else 0
+    return gap_mean, median_gap, gap_std, amount_cv, pattern_code(gap_mean)
+
+@njit('i1[:](i8[:], i8)', cache=True)
+def rolling_pattern(gaps, window):
+    """
+    Pattern code for every run of `window` consecutive gaps, oldest first.
+    
+    Keeps a running window sum so the whole history is classified in O(n)
+    and shifts like weekly → monthly show up as a change in codes.
+    """
+    n = gaps.shape[0]
+    codes = np.zeros(max(n - window + 1, 0), dtype=np.int8)
+    total = 0.0
+    for i in range(n):
+        total += gaps[i]
+        if i >= window:
+            total -= gaps[i - window]
+        if i >= window - 1:
+            codes[i - window + 1] = pattern_code(total / window)
+    return codes
+
+# Analyze top vendors; need at least 3 transactions for a pattern.
+# Counted in Postgres so only those vendors' rows come over the wire;
+# see database/analysis_functions.sql
+client_id = 'spyguy'
+top_result = supabase.rpc('get_top_vendor_counts', {
+    'p_client_id': client_id,
+    'p_limit': 15,
+    'p_min_count': 3
+}).execute()
+top_counts = pd.Series(
+    {row['vendor_name']: row['txn_count'] for row in top_result.data or []},
+    dtype='int64'
+)
+
+# Only the top vendors' rows, sorted oldest first within each vendor
+df = get_transaction_service().fetch_transactions_frame(
+    client_id,
+    columns=('vendor_name', 'amount', 'transaction_date'),
+    vendor_names=top_counts.index.tolist()
+)
+df['amount'] = df['amount'].abs()
+df = df.sort_values(['vendor_name', 'transaction_date'], kind='stable')
+
+days = df['transaction_date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+amounts = df['amount'].to_numpy()
+rows_by_vendor = df.groupby('vendor_name', sort=False).indices
+
+print('TOP VENDORS WITH TRANSACTION PATTERNS:')
+print('=' * 80)
+
+for vendor_name, count in top_counts.items():
+    rows = rows_by_vendor[vendor_name]
+    vendor_days = days[rows]
+    vendor_amounts = amounts[rows]
+    avg_gap, median_gap, gap_std, amount_cv, code = classify_vendor(vendor_days, vendor_amounts)
+    avg_amount = vendor_amounts.mean()
     
     # Pattern detection
-    pattern = "UNKNOWN"
-    if 6 <= avg_gap <= 8:
-        pattern = "WEEKLY"
-    elif 13 <= avg_gap <= 15:
-        pattern = "BI-WEEKLY"
-    elif 28 <= avg_gap <= 32:
-        pattern = "MONTHLY"
-    elif 85 <= avg_gap <= 95:
-        pattern = "QUARTERLY"
-    elif avg_gap < 5:
-        pattern = "DAILY/FREQUENT"
+    pattern = PATTERN_LABELS[code]
     
     print(f'\n{vendor_name}:')
-    print(f'  Transactions: {len(txns)}')
+    print(f'  Transactions: {count}')
     print(f'  Pattern: {pattern}')
-    print(f'  Avg Gap: {avg_gap:.1f} days (median: {median_gap}, std: {gap_std:.1f})')
+    print(f'  Avg Gap: {avg_gap:.1f} days (median: {median_gap:g}, std: {gap_std:.1f})')
     print(f'  Avg Amount: ${avg_amount:,.0f} (CV: {amount_cv:.1%})')
-    print(f'  Recent gaps: {gaps[-5:]} days')
-    print(f'  Recent amounts: ${", ".join(f"{a:,.0f}" for a in amounts[-5:])}')
+    vendor_gaps = np.diff(vendor_days)
+    if len(vendor_gaps) >= ROLLING_WINDOW:
+        codes = rolling_pattern(vendor_gaps, ROLLING_WINDOW)
+        recent_code = np.bincount(codes[-RECENT_WINDOWS:], minlength=len(PATTERN_LABELS)).argmax()
+        print(f'  Recent pattern: {PATTERN_LABELS[recent_code]} (over last {min(len(codes), RECENT_WINDOWS)} {ROLLING_WINDOW}-gap windows)')
+    print(f'  Recent gaps: {vendor_gaps[-5:].tolist()} days')
+    print(f'  Recent amounts: ${", ".join(f"{a:,.0f}" for a in vendor_amounts[-5:])}')
 
 print('\n\nPATTERN DETECTION ISSUES:')
 print('=' * 80)
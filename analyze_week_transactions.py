@@ -2,12 +2,15 @@
 Analyze actual transactions for a specific week and compare to forecast.
 """
 
+import logging
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from collections import defaultdict
 from supabase_client import supabase
 from config.client_context import get_current_client
 
+logger = logging.getLogger(__name__)
+
 
 def analyze_week_transactions(client_id: str, start_date: str, end_date: str):
     """
@@ -26,7 +29,7 @@ def analyze_week_transactions(client_id: str, start_date: str, end_date: str):
     try:
         # Get transactions for the week
         result = supabase.table('transactions') \
-            .select('*') \
+            .select('transaction_date, vendor_name, amount, description') \
             .eq('client_id', client_id) \
             .gte('transaction_date', start_date) \
             .lte('transaction_date', end_date) \
@@ -55,33 +58,25 @@ def analyze_week_transactions(client_id: str, start_date: str, end_date: str):
                 if vendor.get('normalized_name'):
                     vendor_map[vendor['normalized_name']] = vendor['display_name']
         
-        # Process transactions
-        vendor_summary = defaultdict(lambda: {'deposits': 0, 'withdrawals': 0, 'count': 0, 'transactions': []})
-        total_deposits = 0
-        total_withdrawals = 0
+        # Resolve display names with one vectorized lookup; unmapped vendors keep their own name
+        df = pd.DataFrame(transactions)
+        df['amount'] = df['amount'].astype(float)
+        df['vendor_name'] = df['vendor_name'].fillna('Unknown')
+        df['description'] = df['description'].fillna('')
+        df['display_name'] = df['vendor_name'].map(vendor_map).fillna(df['vendor_name'])
         
-        for txn in transactions:
-            amount = float(txn['amount'])
-            vendor_name = txn.get('vendor_name', 'Unknown')
-            
-            # Try to map to display name
-            display_name = vendor_map.get(vendor_name, vendor_name)
-            
-            # Categorize as deposit or withdrawal
-            if amount > 0:
-                vendor_summary[display_name]['deposits'] += amount
-                total_deposits += amount
-            else:
-                vendor_summary[display_name]['withdrawals'] += abs(amount)
-                total_withdrawals += abs(amount)
-            
-            vendor_summary[display_name]['count'] += 1
-            vendor_summary[display_name]['transactions'].append({
-                'date': txn['transaction_date'],
-                'amount': amount,
-                'description': txn.get('description', ''),
-                'original_vendor': vendor_name
-            })
+        # Categorize as deposit or withdrawal in one branchless pass, then total per display name
+        amounts = df['amount'].to_numpy()
+        deposits = np.where(amounts > 0, amounts, 0.0)
+        withdrawals = np.where(amounts < 0, -amounts, 0.0)
+        total_deposits = deposits.sum()
+        total_withdrawals = withdrawals.sum()
+        
+        summary = df.assign(deposit=deposits, withdrawal=withdrawals).groupby('display_name', sort=False).agg(
+            deposits=('deposit', 'sum'),
+            withdrawals=('withdrawal', 'sum'),
+            count=('amount', 'size')
+        )
         
         # Print summary by vendor
         print(f"\n{'VENDOR BREAKDOWN':^80}")
@@ -90,40 +85,59 @@ def analyze_week_transactions(client_id: str, start_date: str, end_date: str):
         print(f"{'-'*80}")
         
         # Sort vendors by total activity (deposits + withdrawals)
-        sorted_vendors = sorted(
-            vendor_summary.items(),
-            key=lambda x: x[1]['deposits'] + x[1]['withdrawals'],
-            reverse=True
-        )
+        summary['activity'] = summary['deposits'] + summary['withdrawals']
+        summary = summary.sort_values('activity', ascending=False, kind='stable')
         
-        for vendor_name, data in sorted_vendors:
-            net_amount = data['deposits'] - data['withdrawals']
-            print(f"{vendor_name[:29]:<30} | ${data['deposits']:>11,.2f} | ${data['withdrawals']:>11,.2f} | ${net_amount:>11,.2f} | {data['count']:>5}")
+        print("\n".join(
+            f"{vendor_name[:29]:<30} | ${deposits:>11,.2f} | ${withdrawals:>11,.2f} | ${deposits - withdrawals:>11,.2f} | {count:>5}"
+            for vendor_name, deposits, withdrawals, count in zip(
+                summary.index, summary['deposits'], summary['withdrawals'], summary['count']
+            )
+        ))
         
         # Print totals
         print(f"{'-'*80}")
         net_total = total_deposits - total_withdrawals
         print(f"{'TOTALS':<30} | ${total_deposits:>11,.2f} | ${total_withdrawals:>11,.2f} | ${net_total:>11,.2f} | {len(transactions):>5}")
         
+        # Per-vendor transaction lists, in date order
+        txn_records = df[['transaction_date', 'amount', 'description', 'vendor_name']].rename(
+            columns={'transaction_date': 'date', 'vendor_name': 'original_vendor'}
+        ).groupby(df['display_name'], sort=False)
+        
         # Print detailed transactions for significant vendors
         print(f"\n{'DETAILED TRANSACTIONS':^80}")
         print(f"{'='*80}")
         
-        for vendor_name, data in sorted_vendors[:5]:  # Top 5 vendors by activity
-            if data['deposits'] + data['withdrawals'] > 100:  # Only show significant vendors
-                print(f"\n{vendor_name}:")
-                print(f"{'Date':<12} | {'Amount':>12} | {'Description':<40}")
-                print(f"{'-'*70}")
-                
-                for txn in sorted(data['transactions'], key=lambda x: x['date']):
-                    desc = txn['description'][:39] if txn['description'] else ''
-                    print(f"{txn['date']:<12} | ${txn['amount']:>11,.2f} | {desc:<40}")
+        top_vendors = summary.head(5)  # Top 5 vendors by activity
+        for vendor_name in top_vendors.index[top_vendors['activity'] > 100]:  # Only show significant vendors
+            print(f"\n{vendor_name}:")
+            print(f"{'Date':<12} | {'Amount':>12} | {'Description':<40}")
+            print(f"{'-'*70}")
+            
+            vendor_txns = txn_records.get_group(vendor_name).sort_values('date', kind='stable')
+            print("\n".join(
+                f"{txn_date:<12} | ${amount:>11,.2f} | {desc[:39]:<40}"
+                for txn_date, amount, desc in zip(vendor_txns['date'], vendor_txns['amount'], vendor_txns['description'])
+            ))
+        
+        vendor_summary = {
+            vendor_name: {
+                'deposits': deposits,
+                'withdrawals': withdrawals,
+                'count': int(count),
+                'transactions': txn_records.get_group(vendor_name).to_dict('records')
+            }
+            for vendor_name, deposits, withdrawals, count in zip(
+                summary.index, summary['deposits'], summary['withdrawals'], summary['count']
+            )
+        }
         
         return {
             'total_deposits': total_deposits,
             'total_withdrawals': total_withdrawals,
             'net_movement': net_total,
-            'vendor_summary': dict(vendor_summary),
+            'vendor_summary': vendor_summary,
             'transaction_count': len(transactions)
         }
         
@@ -170,15 +184,19 @@ def get_forecast_for_week(client_id: str, start_date: str, end_date: str):
 
 
 def compare_actual_vs_forecast(client_id: str, start_date: str, end_date: str):
-    """Compare actual transactions vs forecast for the week."""
+    """
+    Compare actual transactions vs forecast for the week.
+    
+    Returns the comparison as a dict (None if either side is unavailable).
+    """
     actual = analyze_week_transactions(client_id, start_date, end_date)
     if not actual:
-        return
+        return None
     
     forecast = get_forecast_for_week(client_id, start_date, end_date)
     if not forecast:
         print("\nUnable to retrieve forecast data for comparison.")
-        return
+        return None
     
     print(f"\n{'ACTUAL VS FORECAST COMPARISON':^80}")
     print(f"{'='*80}")
@@ -200,13 +218,50 @@ def compare_actual_vs_forecast(client_id: str, start_date: str, end_date: str):
     print(f"{'-'*80}")
     
     # Calculate accuracy percentages
+    dep_accuracy = None
     if forecast['forecasted_deposits'] > 0:
         dep_accuracy = (1 - abs(dep_variance) / forecast['forecasted_deposits']) * 100
         print(f"Deposit forecast accuracy: {dep_accuracy:.1f}%")
     
+    with_accuracy = None
     if forecast['forecasted_withdrawals'] > 0:
         with_accuracy = (1 - abs(with_variance) / forecast['forecasted_withdrawals']) * 100
         print(f"Withdrawal forecast accuracy: {with_accuracy:.1f}%")
+    
+    return {
+        'client_id': client_id,
+        'week_start': start_date,
+        'week_end': end_date,
+        'actual_deposits': float(actual['total_deposits']),
+        'actual_withdrawals': float(actual['total_withdrawals']),
+        'actual_net': float(actual['net_movement']),
+        'forecasted_deposits': float(forecast['forecasted_deposits']),
+        'forecasted_withdrawals': float(forecast['forecasted_withdrawals']),
+        'forecasted_net': float(forecast['forecasted_net']),
+        'deposit_accuracy': dep_accuracy,
+        'withdrawal_accuracy': with_accuracy,
+        'transaction_count': actual['transaction_count']
+    }
+
+
+def compute_and_store_reconciliation(client_id: str, start_date: str, end_date: str):
+    """
+    Run the actual-vs-forecast comparison and persist it to reconciliation_results,
+    keyed by (client_id, week_start), so later reads don't recompute it.
+    """
+    result = compare_actual_vs_forecast(client_id, start_date, end_date)
+    if not result:
+        return None
+    
+    try:
+        supabase.table('reconciliation_results').upsert({
+            **result,
+            'computed_at': datetime.now().isoformat()
+        }, on_conflict='client_id,week_start').execute()
+    except Exception:
+        logger.exception("Error saving reconciliation result for %s week %s", client_id, start_date)
+    
+    return result
 
 
 if __name__ == "__main__":
@@ -6,6 +6,7 @@ Serves data to React frontend
 
 import sys
 import os
+import asyncio
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 from typing import List, Dict, Optional
@@ -14,13 +15,21 @@ import json
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI, HTTPException, Depends
+import orjson
+from fastapi import FastAPI, HTTPException, Depends, BackgroundTasks, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 from supabase_client import supabase
+from utils.pagination import (
+    TRANSACTION_LIST_COLUMNS, apply_transaction_cursor, encode_cursor, iter_transaction_pages
+)
 from forecast_engine import ForecastEngine
+from analyze_week_transactions import compute_and_store_reconciliation
+from utils.ttl_cache import TTLCache
+from utils.forecast_periods import build_forecast_periods
 
-app = FastAPI(title="CFO Forecast API", version="1.0.0")
+app = FastAPI(title="CFO Forecast API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Enable CORS for React frontend
 app.add_middleware(
@@ -56,9 +65,31 @@ class VendorMapping(BaseModel):
     vendor_name: str
     vendor_group_id: int
 
+class ReconcileComputeRequest(BaseModel):
+    client_id: str
+    week_start: str
+    week_end: Optional[str] = None
+
+class VendorMappingBatch(BaseModel):
+    items: List[VendorMapping]
+
+class VendorGroupBatch(BaseModel):
+    items: List[VendorGroupCreate]
+
+# Per-client caches for lookups the dashboard repeats on every render.
+# Write endpoints below pop the client's entry so edits show up immediately.
+engine_cache = TTLCache(maxsize=256, ttl=300)
+vendor_groups_cache = TTLCache(maxsize=256, ttl=60)
+vendor_mappings_cache = TTLCache(maxsize=256, ttl=60)
+
+def invalidate_client_caches(client_id: str):
+    """Drop cached vendor groups/mappings after a write for client_id."""
+    vendor_groups_cache.pop(client_id)
+    vendor_mappings_cache.pop(client_id)
+
 # Helper functions
 def get_forecast_engine(client_id: str) -> ForecastEngine:
-    return ForecastEngine(client_id)
+    return engine_cache.get_or_load(client_id, lambda: ForecastEngine(client_id))
 
 # API Endpoints
 
@@ -76,28 +107,26 @@ async def get_forecast_dashboard(client_id: str, weeks: int = 12):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/forecast/dashboard/{client_id}/stream")
+def stream_forecast_dashboard(client_id: str, weeks: int = 12):
+    """Stream the raw forecast_dashboard_view rows for the period as NDJSON"""
+    engine = get_forecast_engine(client_id)
+    
+    def rows():
+        for row in engine.iter_forecast_rows(weeks=weeks):
+            yield orjson.dumps(row, default=str) + b'\n'
+    
+    return StreamingResponse(rows(), media_type='application/x-ndjson')
+
 @app.get("/api/forecast/periods/{client_id}")
 async def get_forecast_periods(client_id: str, weeks: int = 12):
     """Get forecast periods (weeks) for column headers"""
     try:
-        # Generate next 12+ weeks starting from this Monday
+        # Next 12+ weeks starting from this Monday; shared by every client until Monday rolls over
         today = date.today()
-        days_behind = today.weekday()
-        start_date = today - timedelta(days=days_behind)
+        start_date = today - timedelta(days=today.weekday())
         
-        periods = []
-        for i in range(weeks):
-            week_start = start_date + timedelta(weeks=i)
-            week_end = week_start + timedelta(days=6)
-            
-            periods.append({
-                'week_number': i + 1,
-                'start_date': week_start.isoformat(),
-                'end_date': week_end.isoformat(),
-                'display_text': f"{week_start.month}/{week_start.day}/{str(week_start.year)[2:]}"
-            })
-        
-        return {'periods': periods}
+        return {'periods': build_forecast_periods(start_date, weeks)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -105,8 +134,11 @@ async def get_forecast_periods(client_id: str, weeks: int = 12):
 async def get_vendor_groups(client_id: str):
     """Get all vendor groups for a client"""
     try:
-        result = supabase.table('vendor_groups').select('*').eq('client_id', client_id).order('category', 'subcategory').execute()
-        return {'vendor_groups': result.data}
+        vendor_groups = vendor_groups_cache.get_or_load(
+            client_id,
+            lambda: supabase.table('vendor_groups').select('*').eq('client_id', client_id).order('category', 'subcategory').execute().data
+        )
+        return {'vendor_groups': vendor_groups}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -122,11 +154,35 @@ async def create_vendor_group(vendor_group: VendorGroupCreate):
             'subcategory': vendor_group.subcategory,
             'is_inflow': vendor_group.is_inflow
         }).execute()
+        invalidate_client_caches(vendor_group.client_id)
         
         return {'success': True, 'vendor_group': result.data[0]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/forecast/vendor-groups/bulk")
+async def create_vendor_groups_bulk(batch: VendorGroupBatch):
+    """Create many vendor groups in a single insert"""
+    try:
+        rows = [{
+            'client_id': vendor_group.client_id,
+            'group_name': vendor_group.group_name,
+            'display_name': vendor_group.display_name,
+            'category': vendor_group.category,
+            'subcategory': vendor_group.subcategory,
+            'is_inflow': vendor_group.is_inflow
+        } for vendor_group in batch.items]
+        if not rows:
+            return {'success': True, 'vendor_groups': []}
+        
+        result = supabase.table('vendor_groups').insert(rows).execute()
+        for client_id in {row['client_id'] for row in rows}:
+            invalidate_client_caches(client_id)
+        
+        return {'success': True, 'vendor_groups': result.data}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/forecast/cell-update")
 async def update_forecast_cell(cell_update: ForecastCellUpdate):
     """Update a single forecast cell value"""
@@ -153,9 +209,10 @@ async def generate_forecasts(client_id: str, weeks: int = 12):
         # First update all forecast rules with latest patterns
         vendor_groups_result = supabase.table('vendor_groups').select('id').eq('client_id', client_id).execute()
         
-        for vg in vendor_groups_result.data:
-            pattern = engine.detect_vendor_group_pattern(vg['id'])
-            engine.update_vendor_group_forecast_rule(vg['id'], pattern)
+        # One query for every group's transactions and one upsert for all
+        # rules; run off the event loop since the Supabase client blocks
+        group_ids = [vg['id'] for vg in vendor_groups_result.data]
+        await asyncio.to_thread(engine.refresh_vendor_group_forecast_rules, group_ids)
         
         # Generate forecasts
         forecasts = engine.generate_forecasts(weeks=weeks)
@@ -190,14 +247,46 @@ async def reconcile_week(reconciliation: ReconciliationRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/reconcile/compute")
+async def compute_reconciliation(request: ReconcileComputeRequest, background_tasks: BackgroundTasks):
+    """Queue the actual-vs-forecast comparison for a week; read it back from GET /api/reconcile"""
+    try:
+        week_start = date.fromisoformat(request.week_start)
+        week_end = date.fromisoformat(request.week_end) if request.week_end else week_start + timedelta(days=6)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    background_tasks.add_task(
+        compute_and_store_reconciliation,
+        request.client_id, week_start.isoformat(), week_end.isoformat()
+    )
+    return {'success': True, 'status': 'queued', 'week_start': week_start, 'week_end': week_end}
+
+@app.get("/api/reconcile/{client_id}/{week_start}")
+async def get_reconciliation(client_id: str, week_start: str):
+    """Get the stored actual-vs-forecast comparison for a week"""
+    try:
+        result = supabase.table('reconciliation_results').select('*').eq(
+            'client_id', client_id
+        ).eq('week_start', week_start).limit(1).execute()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if not result.data:
+        raise HTTPException(status_code=404, detail='No reconciliation computed for this week yet')
+    return result.data[0]
+
 @app.get("/api/vendor-mappings/{client_id}")
 async def get_vendor_mappings(client_id: str):
     """Get all vendor mappings for a client"""
     try:
-        result = supabase.table('vendor_group_mappings').select(
-            '*, vendor_groups(*)'
-        ).eq('client_id', client_id).execute()
-        return {'mappings': result.data}
+        mappings = vendor_mappings_cache.get_or_load(
+            client_id,
+            lambda: supabase.table('vendor_group_mappings').select(
+                '*, vendor_groups(*)'
+            ).eq('client_id', client_id).execute().data
+        )
+        return {'mappings': mappings}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -210,22 +299,71 @@ async def create_vendor_mapping(mapping: VendorMapping):
             'vendor_name': mapping.vendor_name,
             'vendor_group_id': mapping.vendor_group_id
         }).execute()
+        invalidate_client_caches(mapping.client_id)
         
         return {'success': True, 'mapping': result.data[0]}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/vendor-mappings/bulk")
+async def create_vendor_mappings_bulk(batch: VendorMappingBatch):
+    """Create or update many vendor mappings in a single upsert"""
+    try:
+        rows = [{
+            'client_id': mapping.client_id,
+            'vendor_name': mapping.vendor_name,
+            'vendor_group_id': mapping.vendor_group_id
+        } for mapping in batch.items]
+        if not rows:
+            return {'success': True, 'mappings': []}
+        
+        result = supabase.table('vendor_group_mappings').upsert(
+            rows, on_conflict='client_id,vendor_name'
+        ).execute()
+        for client_id in {row['client_id'] for row in rows}:
+            invalidate_client_caches(client_id)
+        
+        return {'success': True, 'mappings': result.data}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/transactions/{client_id}")
-async def get_transactions(client_id: str, limit: int = 100):
-    """Get recent transactions for a client"""
+async def get_transactions(client_id: str, limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None):
+    """
+    Get recent transactions for a client, newest first.
+    
+    Pass the returned next_cursor back as `cursor` to fetch the following
+    page; next_cursor is None on the last page.
+    """
     try:
-        result = supabase.table('transactions').select('*').eq(
-            'client_id', client_id
-        ).order('transaction_date', desc=True).limit(limit).execute()
-        return {'transactions': result.data}
+        query = supabase.table('transactions').select(TRANSACTION_LIST_COLUMNS).eq('client_id', client_id)
+        try:
+            query = apply_transaction_cursor(query, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        result = query.limit(limit).execute()
+        rows = result.data or []
+        next_cursor = encode_cursor(rows[-1]) if len(rows) == limit else None
+        return {'transactions': rows, 'next_cursor': next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/transactions/{client_id}/stream")
+def stream_transactions(client_id: str, page_size: int = Query(1000, ge=1, le=1000)):
+    """Stream every transaction for a client as NDJSON, newest first, one keyset page at a time"""
+    def rows():
+        pages = iter_transaction_pages(
+            lambda: supabase.table('transactions').select(TRANSACTION_LIST_COLUMNS).eq('client_id', client_id),
+            page_size
+        )
+        for page in pages:
+            yield b''.join(orjson.dumps(row, default=str) + b'\n' for row in page)
+    
+    return StreamingResponse(rows(), media_type='application/x-ndjson')
+
 @app.post("/api/setup/default-groups/{client_id}")
 async def setup_default_groups(client_id: str):
     """Set up default vendor groups for a new client"""
@@ -234,6 +372,7 @@ async def setup_default_groups(client_id: str):
         result = supabase.rpc('create_default_vendor_groups', {
             'p_client_id': client_id
         }).execute()
+        invalidate_client_caches(client_id)
         
         return {'success': True, 'message': 'Default vendor groups created'}
     except Exception as e:
@@ -257,6 +396,7 @@ async def setup_default_groups(client_id: str):
                 group['client_id'] = client_id
             
             result = supabase.table('vendor_groups').insert(default_groups).execute()
+            invalidate_client_caches(client_id)
             return {'success': True, 'message': 'Default vendor groups created manually'}
         except Exception as e2:
             raise HTTPException(status_code=500, detail=f"Failed to create default groups: {str(e2)}")
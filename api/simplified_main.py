@@ -6,20 +6,29 @@ Works with existing Supabase database structure
 
 import sys
 import os
+import asyncio
+import hashlib
 from datetime import date, datetime, timedelta
 from typing import List, Dict, Optional
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from fastapi import FastAPI, HTTPException
+import orjson
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from pydantic import BaseModel
 
 from supabase_client import supabase
+from utils.pagination import (
+    TRANSACTION_LIST_COLUMNS, apply_transaction_cursor, encode_cursor, iter_transaction_pages
+)
 from simplified_forecast_engine import SimplifiedForecastEngine
+from utils.forecast_periods import build_forecast_periods
+from utils.ttl_cache import TTLCache
 
-app = FastAPI(title="CFO Forecast API (Simplified)", version="1.0.0")
+app = FastAPI(title="CFO Forecast API (Simplified)", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Enable CORS for React frontend
 app.add_middleware(
@@ -37,7 +46,21 @@ class ForecastCellUpdate(BaseModel):
     vendor_group_id: int
     new_amount: float
 
+# Per-client caches for lookups the dashboard repeats on every render
+engine_cache = TTLCache(maxsize=256, ttl=300)
+vendor_mappings_cache = TTLCache(maxsize=256, ttl=60)
+
+def get_forecast_engine(client_id: str) -> SimplifiedForecastEngine:
+    return engine_cache.get_or_load(client_id, lambda: SimplifiedForecastEngine(client_id))
+
+# Vendor groups come from the engine's static category table, so the response
+# body and its ETag are computed once at startup
+VENDOR_GROUPS_BODY = orjson.dumps({'vendor_groups': SimplifiedForecastEngine.get_vendor_groups()})
+VENDOR_GROUPS_ETAG = f'"{hashlib.blake2s(VENDOR_GROUPS_BODY).hexdigest()}"'
+
 # API Endpoints
+# The Supabase client (supabase-py 1.x) is synchronous, so handlers run its
+# calls with asyncio.to_thread to keep the event loop free for other requests
 
 @app.get("/")
 async def root():
@@ -47,9 +70,11 @@ async def root():
 async def get_forecast_dashboard(client_id: str, weeks: int = 12):
     """Get forecast dashboard data for spreadsheet display"""
     try:
-        engine = SimplifiedForecastEngine(client_id)
-        dashboard_data = engine.get_vendor_forecast_data(weeks=weeks)
-        return dashboard_data
+        engine = get_forecast_engine(client_id)
+        dashboard_data = await asyncio.to_thread(engine.get_vendor_forecast_data, weeks)
+        # Returned as a response directly so orjson serializes the nested dict
+        # (date keys included) without FastAPI's jsonable_encoder walk first
+        return ORJSONResponse(dashboard_data)
     except Exception as e:
         print(f"Dashboard error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -58,47 +83,35 @@ async def get_forecast_dashboard(client_id: str, weeks: int = 12):
 async def get_forecast_periods(client_id: str, weeks: int = 12):
     """Get forecast periods (weeks) for column headers"""
     try:
-        # Generate next 12+ weeks starting from this Monday
+        # Next 12+ weeks starting from this Monday; shared by every client until Monday rolls over
         today = date.today()
-        days_behind = today.weekday()
-        start_date = today - timedelta(days=days_behind)
+        start_date = today - timedelta(days=today.weekday())
         
-        periods = []
-        for i in range(weeks):
-            week_start = start_date + timedelta(weeks=i)
-            week_end = week_start + timedelta(days=6)
-            
-            periods.append({
-                'week_number': i + 1,
-                'start_date': week_start.isoformat(),
-                'end_date': week_end.isoformat(),
-                'display_text': f"{week_start.month}/{week_start.day}/{str(week_start.year)[2:]}"
-            })
-        
-        return {'periods': periods}
+        return {'periods': build_forecast_periods(start_date, weeks)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/forecast/vendor-groups/{client_id}")
-async def get_vendor_groups(client_id: str):
-    """Get all vendor groups for a client"""
-    try:
-        engine = SimplifiedForecastEngine(client_id)
-        vendor_groups = engine.get_vendor_groups()
-        return {'vendor_groups': vendor_groups}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+async def get_vendor_groups(client_id: str, request: Request):
+    """Get all vendor groups for a client; answers 304 when If-None-Match matches"""
+    headers = {'ETag': VENDOR_GROUPS_ETAG}
+    if_none_match = request.headers.get('if-none-match', '')
+    if VENDOR_GROUPS_ETAG in (tag.strip() for tag in if_none_match.split(',')):
+        return Response(status_code=304, headers=headers)
+    return Response(content=VENDOR_GROUPS_BODY, media_type='application/json', headers=headers)
 
 @app.post("/api/forecast/cell-update")
 async def update_forecast_cell(cell_update: ForecastCellUpdate):
     """Update a single forecast cell value"""
     try:
-        engine = SimplifiedForecastEngine(cell_update.client_id)
-        success = engine.update_forecast_cell(
+        engine = get_forecast_engine(cell_update.client_id)
+        success = await asyncio.to_thread(
+            engine.update_forecast_cell,
             cell_update.forecast_date,
             cell_update.vendor_group_id,
             cell_update.new_amount
         )
+        engine_cache.pop(cell_update.client_id)
         return {'success': success, 'message': 'Forecast updated'}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -107,8 +120,8 @@ async def update_forecast_cell(cell_update: ForecastCellUpdate):
 async def generate_forecasts(client_id: str, weeks: int = 12):
     """Generate new forecasts for a client"""
     try:
-        engine = SimplifiedForecastEngine(client_id)
-        dashboard_data = engine.get_vendor_forecast_data(weeks=weeks)
+        engine = get_forecast_engine(client_id)
+        dashboard_data = await asyncio.to_thread(engine.get_vendor_forecast_data, weeks)
         
         return {
             'success': True,
@@ -122,28 +135,60 @@ async def generate_forecasts(client_id: str, weeks: int = 12):
 async def get_vendor_mappings(client_id: str):
     """Get all vendors for a client (using existing vendors table)"""
     try:
-        result = supabase.table('vendors').select('*').eq('client_id', client_id).execute()
-        return {'mappings': result.data}
+        mappings = await asyncio.to_thread(
+            vendor_mappings_cache.get_or_load,
+            client_id,
+            lambda: supabase.table('vendors').select('*').eq('client_id', client_id).execute().data
+        )
+        return {'mappings': mappings}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/transactions/{client_id}")
-async def get_transactions(client_id: str, limit: int = 100):
-    """Get recent transactions for a client"""
+async def get_transactions(client_id: str, limit: int = Query(100, ge=1, le=1000), cursor: Optional[str] = None):
+    """
+    Get recent transactions for a client, newest first.
+    
+    Pass the returned next_cursor back as `cursor` to fetch the following
+    page; next_cursor is None on the last page.
+    """
     try:
-        result = supabase.table('transactions').select('*').eq(
-            'client_id', client_id
-        ).order('transaction_date', desc=True).limit(limit).execute()
-        return {'transactions': result.data}
+        query = supabase.table('transactions').select(TRANSACTION_LIST_COLUMNS).eq('client_id', client_id)
+        try:
+            query = apply_transaction_cursor(query, cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        result = await asyncio.to_thread(query.limit(limit).execute)
+        rows = result.data or []
+        next_cursor = encode_cursor(rows[-1]) if len(rows) == limit else None
+        return {'transactions': rows, 'next_cursor': next_cursor}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/transactions/{client_id}/stream")
+def stream_transactions(client_id: str, page_size: int = Query(1000, ge=1, le=1000)):
+    """Stream every transaction for a client as NDJSON, newest first, one keyset page at a time"""
+    def rows():
+        pages = iter_transaction_pages(
+            lambda: supabase.table('transactions').select(TRANSACTION_LIST_COLUMNS).eq('client_id', client_id),
+            page_size
+        )
+        for page in pages:
+            yield b''.join(orjson.dumps(row, default=str) + b'\n' for row in page)
+    
+    return StreamingResponse(rows(), media_type='application/x-ndjson')
+
 @app.post("/api/setup/default-groups/{client_id}")
 async def setup_default_groups(client_id: str):
     """Set up default vendor groups (using existing vendors table structure)"""
     try:
         # Check if we already have vendors for this client
-        result = supabase.table('vendors').select('*').eq('client_id', client_id).limit(5).execute()
+        result = await asyncio.to_thread(
+            supabase.table('vendors').select('*').eq('client_id', client_id).limit(5).execute
+        )
         
         return {
             'success': True, 
@@ -4,6 +4,7 @@ Supabase client configuration.
 
 import os
 import sys
+from functools import lru_cache
 from pathlib import Path
 
 # Try to import supabase
@@ -41,8 +42,85 @@ if not SUPABASE_URL or not SUPABASE_KEY:
     
     raise ValueError("SUPABASE_URL and SUPABASE_KEY must be set")
 
+# Shared HTTP pool so repeated PostgREST calls reuse keep-alive connections
+# instead of paying a TLS handshake each time
+HTTP_LIMITS = {
+    'max_keepalive_connections': 20,
+    'max_connections': 50,
+    'keepalive_expiry': 60
+}
+
+# Seconds before a PostgREST request gives up
+POSTGREST_TIMEOUT = 30
+
+
+def _http2_available() -> bool:
+    # HTTP/2 needs the optional 'h2' package; fall back to HTTP/1.1 keep-alive
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _create_http_client(**client_kwargs):
+    """Build a pooled httpx client, or None if httpx is unavailable."""
+    try:
+        import httpx
+    except ImportError:
+        return None
+    
+    http2 = _http2_available()
+    limits = httpx.Limits(**HTTP_LIMITS)
+    return httpx.Client(
+        http2=http2,
+        limits=limits,
+        transport=httpx.HTTPTransport(http2=http2, limits=limits, retries=2),
+        **client_kwargs
+    )
+
+
+def _pool_postgrest_session(client: Client) -> None:
+    """
+    Older supabase-py (1.x) builds its own PostgREST httpx session; swap it for
+    a pooled one carrying the same base URL, headers and timeout.
+    """
+    postgrest = getattr(client, 'postgrest', None)
+    session = getattr(postgrest, 'session', None)
+    if session is None:
+        return
+    
+    pooled = _create_http_client(
+        base_url=session.base_url,
+        headers=session.headers,
+        timeout=session.timeout
+    )
+    if pooled is None:
+        return
+    postgrest.session = pooled
+    session.close()
+
+
+@lru_cache(maxsize=None)
+def get_supabase_client() -> Client:
+    """The process-wide Supabase client; built once so every caller shares its connection pool."""
+    http_client = _create_http_client(timeout=POSTGREST_TIMEOUT)
+    if http_client is not None:
+        try:
+            from supabase import ClientOptions
+            return create_client(SUPABASE_URL, SUPABASE_KEY,
+                                 options=ClientOptions(httpx_client=http_client))
+        except (ImportError, TypeError):
+            # Older supabase-py without httpx_client support
+            http_client.close()
+    
+    client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    _pool_postgrest_session(client)
+    return client
+
+
 # Create Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+supabase: Client = get_supabase_client()
 
 # Export the client
-__all__ = ['supabase']
\ No newline at end of file
+__all__ = ['supabase', 'get_supabase_client']
\ No newline at end of file
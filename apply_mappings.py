@@ -6,21 +6,31 @@ import os
 # Add the project root to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from supabase_client import supabase
+from utils.batching import chunks
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def load_mappings():
-    """Load mappings from CSV file."""
+    """
+    Load mappings from CSV file.
+    
+    Returns vendor_name -> (display_name, vendor_type, notes).
+    """
     mappings = {}
-    with open('vendor_mapping_template.csv', 'r') as f:
-        reader = csv.DictReader(f)
+    with open('vendor_mapping_template.csv', 'r', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        vendor_idx = header.index('vendor_name')
+        display_idx = header.index('display_name')
+        type_idx = header.index('vendor_type')
+        notes_idx = header.index('notes') if 'notes' in header else None
+        
         for row in reader:
-            mappings[row['vendor_name']] = {
-                'display_name': row['display_name'],
-                'vendor_type': row['vendor_type'],
-                'notes': row.get('notes', '')
-            }
+            if not row:
+                continue
+            notes = row[notes_idx] if notes_idx is not None and notes_idx < len(row) else ''
+            mappings[row[vendor_idx]] = (row[display_idx], row[type_idx], notes)
     return mappings
 
 def apply_mappings():
@@ -39,24 +49,29 @@ def apply_mappings():
     
     vendors = response.data
     
-    # Apply mappings
+    # Group vendors by their new (display_name, vendor_group) so each distinct
+    # mapping is one UPDATE ... WHERE vendor_name IN (...) instead of one per vendor
+    updates = {}
     for vendor in vendors:
         vendor_name = vendor['vendor_name']
         if vendor_name in mappings:
-            mapping = mappings[vendor_name]
-            logger.info(f"Updating {vendor_name} → {mapping['display_name']}")
-            
+            display_name, vendor_type, _ = mappings[vendor_name]
+            logger.info(f"Updating {vendor_name} → {display_name}")
+            updates.setdefault((display_name, vendor_type), []).append(vendor_name)
+    
+    for (display_name, vendor_type), vendor_names in updates.items():
+        for batch in chunks(vendor_names):
             res = supabase.table('vendors') \
                 .update({
-                    'display_name': mapping['display_name'],
-                    'vendor_group': mapping['vendor_type']
+                    'display_name': display_name,
+                    'vendor_group': vendor_type
                 }) \
-                .eq('vendor_name', vendor_name) \
                 .eq('client_id', 'spyguy') \
+                .in_('vendor_name', batch) \
                 .execute()
             
             if hasattr(res, 'error') and res.error:
-                logger.error(f"Failed to update {vendor_name}: {res.error}")
+                logger.error(f"Failed to update {len(batch)} vendors: {res.error}")
 
 if __name__ == '__main__':
     apply_mappings() 
\ No newline at end of file
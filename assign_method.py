@@ -1,10 +1,16 @@
 from datetime import datetime, timedelta
-from collections import defaultdict
 from statistics import mean, stdev
 import logging
 
+import numpy as np
+
+from utils.numba_compat import njit
+
 logger = logging.getLogger(__name__)
 
+# A Monday, so days since it mod 7 is the weekday (Mon=0, Sun=6)
+WEEKDAY_EPOCH = np.datetime64('1970-01-05', 'D')
+
 def detect_frequency(transactions):
     """
     Detect if a vendor has regular monthly activity based on transaction history.
@@ -18,44 +24,48 @@ def detect_frequency(transactions):
     six_months_ago = today - timedelta(days=180)
     
     # Filter last 180 days
-    recent_txns = [t for t in transactions if t['date'] >= six_months_ago]
-    if len(recent_txns) < 3:
+    dates = np.array([t['date'] for t in transactions], dtype='datetime64[us]')
+    recent = dates[dates >= np.datetime64(six_months_ago, 'us')]
+    if recent.size < 3:
         logger.info("Less than 3 transactions in past 6 months")
         return 'irregular', None
 
-    # Bucket by (year, month)
-    months_seen = defaultdict(list)
-    for txn in recent_txns:
-        key = (txn['date'].year, txn['date'].month)
-        months_seen[key].append(txn['date'])
-
-    # Check for regular monthly pattern
-    if len(months_seen) >= 3:
+    # Check for regular monthly pattern: activity in at least 3 distinct months
+    if np.unique(recent.astype('datetime64[M]')).size >= 3:
         # Calculate average weekday (Mon=0, Sun=6)
-        all_days = [d.weekday() for days in months_seen.values() for d in days]
-        avg_weekday = round(sum(all_days) / len(all_days))
+        weekdays = (recent.astype('datetime64[D]') - WEEKDAY_EPOCH).astype(np.int64) % 7
+        avg_weekday = round(float(weekdays.mean()))
         logger.info(f"Detected monthly pattern with average day {avg_weekday}")
         return 'monthly', avg_weekday
 
     logger.info("No clear monthly pattern detected")
     return 'irregular', None
 
+@njit('i8(i1[:])', cache=True)
+def mode_day(days):
+    """
+    Most common day of month, ties going to the day seen first (like
+    statistics.mode). Days are 1-31, so a 32-slot histogram is enough.
+    """
+    counts = np.zeros(32, dtype=np.int64)
+    for d in days:
+        counts[d] += 1
+    best = counts.max()
+    for d in days:
+        if counts[d] == best:
+            return d
+    return 0
+
 def estimate_payment_day(transactions):
     """Estimate the day of month for payments based on transaction history"""
     if not transactions:
         return None
         
     # Get all days of month from transactions
-    days = [t['date'].day for t in transactions]
+    days = np.fromiter((t['date'].day for t in transactions), dtype=np.int8, count=len(transactions))
     
-    # Use mode (most common day) if available, otherwise average
-    if days:
-        from statistics import mode
-        try:
-            return mode(days)
-        except:
-            return round(sum(days) / len(days))
-    return None
+    # Most common day of month
+    return int(mode_day(days))
 
 def get_forecast_method(frequency, transactions):
     """Determine the appropriate forecast method based on frequency and data"""
@@ -7,16 +7,82 @@ Generates forecasts for vendors with consistent, predictable patterns
 import sys
 sys.path.append('.')
 
-from pattern_detection_engine import PatternDetectionEngine
+from pattern_detection_engine import PatternDetectionEngine, pattern_cache
 from supabase_client import supabase
+from utils.batching import chunks
 from datetime import datetime, date, timedelta
 from dataclasses import dataclass
+from operator import attrgetter
 from typing import Dict, List, Optional
-import calendar
 
-@dataclass
+import numpy as np
+import pandas as pd
+
+def _every_n_days(first: date, end_date: date, step: int) -> np.ndarray:
+    """first, first + step, ... through end_date as datetime64[D]"""
+    return np.arange(np.datetime64(first, 'D'), np.datetime64(end_date, 'D') + 1, step)
+
+def _monthly_on_day(first_month: np.datetime64, end_date: date, day: int, step: int = 1) -> np.ndarray:
+    """
+    `day` of every `step`-th month from first_month, clamped to each month's
+    length (e.g. Feb 30 -> Feb 28), keeping dates through end_date.
+    """
+    months = np.arange(first_month, np.datetime64(end_date, 'M') + 1, step)
+    month_starts = months.astype('datetime64[D]')
+    days_in_month = ((months + 1).astype('datetime64[D]') - month_starts).astype(np.int64)
+    dates = month_starts + (np.minimum(day, days_in_month) - 1)
+    return dates[dates <= np.datetime64(end_date, 'D')]
+
+def _daily_dates(start_date, end_date, last_date, timing_pattern):
+    # Every day after start_date, including the day after end_date
+    return _every_n_days(start_date + timedelta(days=1), end_date + timedelta(days=1), 1)
+
+def _weekly_dates(start_date, end_date, last_date, timing_pattern):
+    # Same day of week, starting with its next occurrence after start_date
+    target_weekday = timing_pattern.day_of_week if timing_pattern.day_of_week is not None else last_date.weekday()
+    days_ahead = (target_weekday - start_date.weekday()) % 7 or 7
+    return _every_n_days(start_date + timedelta(days=days_ahead), end_date, 7)
+
+def _bi_weekly_dates(start_date, end_date, last_date, timing_pattern):
+    # Every 14 days on the same day of week; a match today skips a full cycle
+    target_weekday = timing_pattern.day_of_week if timing_pattern.day_of_week is not None else last_date.weekday()
+    days_ahead = (target_weekday - start_date.weekday()) % 7 or 14
+    return _every_n_days(start_date + timedelta(days=days_ahead), end_date, 14)
+
+def _monthly_dates(start_date, end_date, last_date, timing_pattern):
+    # Same day of month, starting next month
+    target_day = timing_pattern.day_of_month if timing_pattern.day_of_month is not None else last_date.day
+    return _monthly_on_day(np.datetime64(start_date, 'M') + 1, end_date, target_day)
+
+def _quarterly_dates(start_date, end_date, last_date, timing_pattern):
+    # start_date's day in the first month of each following quarter (Jan/Apr/Jul/Oct)
+    month_index = np.datetime64(start_date, 'M').astype(np.int64)
+    next_quarter = np.datetime64(int((month_index // 3 + 1) * 3), 'M')
+    return _monthly_on_day(next_quarter, end_date, start_date.day, step=3)
+
+def _irregular_dates(start_date, end_date, last_date, timing_pattern):
+    # Average frequency, including the first date past end_date
+    frequency_days = timing_pattern.frequency_days if timing_pattern.frequency_days > 0 else 30
+    return _every_n_days(
+        start_date + timedelta(days=frequency_days), end_date + timedelta(days=frequency_days), frequency_days
+    )
+
+# Forecast date builders by timing pattern type; anything else is irregular
+_FORECAST_DATE_BUILDERS = {
+    'daily': _daily_dates,
+    'weekly': _weekly_dates,
+    'bi_weekly': _bi_weekly_dates,
+    'monthly': _monthly_dates,
+    'quarterly': _quarterly_dates
+}
+
+@dataclass(frozen=True)
 class ForecastRecord:
     """Individual forecast record for a specific date"""
+    # Declared by hand (not slots=True) so this keeps working before Python 3.10;
+    # drops the per-instance __dict__ across a run's thousands of records
+    __slots__ = ('vendor_name', 'forecast_date', 'predicted_amount', 'confidence', 'pattern_type', 'reasoning')
+    
     vendor_name: str
     forecast_date: date
     predicted_amount: float
@@ -47,159 +113,98 @@ class AutoForecastGenerator:
         
         print(f"🎯 Generating forecasts for {len(auto_vendors)} auto-ready vendors")
         
+        # Last transaction date of every auto vendor in one query
+        last_dates = self._fetch_last_txn_dates(client_id, list(auto_vendors))
+        
+        # Forecast window shared by every vendor in this run
+        today = date.today()
+        end_date = today + timedelta(days=self.forecast_horizon_days)
+        
         # Generate forecasts for each vendor
         all_forecasts = []
         
         for vendor_name, pattern in auto_vendors.items():
-            forecasts = self._generate_vendor_forecasts(vendor_name, pattern, client_id)
+            forecasts = self._generate_vendor_forecasts(vendor_name, pattern, last_dates.get(vendor_name), today, end_date)
             all_forecasts.extend(forecasts)
             print(f"├── {vendor_name}: {len(forecasts)} forecast records generated")
         
         print(f"\n✅ Generated {len(all_forecasts)} total forecast records")
-        print(f"📅 Forecast period: {date.today()} to {date.today() + timedelta(days=self.forecast_horizon_days)}")
+        print(f"📅 Forecast period: {today} to {end_date}")
         
         return all_forecasts
     
-    def _generate_vendor_forecasts(self, vendor_name: str, pattern, client_id: str) -> List[ForecastRecord]:
-        """Generate forecast records for a single vendor"""
+    def _fetch_last_txn_dates(self, client_id: str, vendor_names: List[str]) -> Dict[str, date]:
+        """Most recent transaction date per vendor (see database/analysis_functions.sql)"""
+        if not vendor_names:
+            return {}
         
-        # Get the vendor's transaction history
-        result = supabase.table('transactions').select('*')\
-            .eq('client_id', client_id)\
-            .eq('vendor_name', vendor_name)\
-            .order('transaction_date')\
-            .execute()
+        result = supabase.rpc('get_last_transaction_dates', {
+            'p_client_id': client_id,
+            'p_vendor_names': vendor_names
+        }).execute()
         
-        transactions = result.data
-        if not transactions:
-            return []
+        return {
+            row['vendor_name']: date.fromisoformat(row['last_date'])
+            for row in result.data or []
+        }
+    
+    def _generate_vendor_forecasts(self, vendor_name: str, pattern, last_txn_date: Optional[date],
+                                   today: date, end_date: date) -> List[ForecastRecord]:
+        """Generate forecast records for a single vendor from its last transaction date through end_date"""
         
-        # Find the last transaction date
-        last_txn_date = datetime.fromisoformat(transactions[-1]['transaction_date']).date()
+        # No transaction history
+        if last_txn_date is None:
+            return []
         
         # Generate forecast dates based on timing pattern
         forecast_dates = self._calculate_forecast_dates(
             last_txn_date, 
             pattern.timing_pattern,
-            self.forecast_horizon_days
+            today,
+            end_date
         )
         
+        # Every record for this vendor shares the same amount, confidence and reasoning
+        pattern_type = pattern.timing_pattern.pattern_type
+        average_amount = pattern.amount_pattern.average_amount
+        confidence = min(pattern.timing_pattern.confidence, pattern.amount_pattern.confidence)
+        reasoning = f"{pattern_type.title()} pattern, ${average_amount:,.0f} average"
+        
         # Create forecast records
-        forecasts = []
-        for forecast_date in forecast_dates:
-            forecast = ForecastRecord(
+        return [
+            ForecastRecord(
                 vendor_name=vendor_name,
                 forecast_date=forecast_date,
-                predicted_amount=pattern.amount_pattern.average_amount,
-                confidence=min(pattern.timing_pattern.confidence, pattern.amount_pattern.confidence),
-                pattern_type=pattern.timing_pattern.pattern_type,
-                reasoning=f"{pattern.timing_pattern.pattern_type.title()} pattern, ${pattern.amount_pattern.average_amount:,.0f} average"
+                predicted_amount=average_amount,
+                confidence=confidence,
+                pattern_type=pattern_type,
+                reasoning=reasoning
             )
-            forecasts.append(forecast)
-        
-        return forecasts
+            for forecast_date in forecast_dates
+        ]
     
-    def _calculate_forecast_dates(self, last_date: date, timing_pattern, horizon_days: int) -> List[date]:
+    def _calculate_forecast_dates(self, last_date: date, timing_pattern, today: date, end_date: date) -> List[date]:
         """Calculate future forecast dates based on timing pattern"""
-        forecast_dates = []
-        start_date = max(last_date, date.today())  # Don't forecast in the past
-        current_date = start_date
-        end_date = date.today() + timedelta(days=horizon_days)
-        
-        if timing_pattern.pattern_type == 'daily':
-            # Daily pattern
-            while current_date <= end_date:
-                current_date += timedelta(days=1)
-                forecast_dates.append(current_date)
-        
-        elif timing_pattern.pattern_type == 'weekly':
-            # Weekly pattern - same day of week
-            target_weekday = timing_pattern.day_of_week if timing_pattern.day_of_week is not None else last_date.weekday()
-            
-            # Find next occurrence of target weekday
-            days_ahead = (target_weekday - current_date.weekday()) % 7
-            if days_ahead == 0:  # If it's the same day, go to next week
-                days_ahead = 7
-            
-            current_date += timedelta(days=days_ahead)
-            
-            while current_date <= end_date:
-                forecast_dates.append(current_date)
-                current_date += timedelta(days=7)
-        
-        elif timing_pattern.pattern_type == 'bi_weekly':
-            # Bi-weekly pattern - every 14 days, same day of week
-            target_weekday = timing_pattern.day_of_week if timing_pattern.day_of_week is not None else last_date.weekday()
-            
-            # Find next occurrence of target weekday
-            days_ahead = (target_weekday - current_date.weekday()) % 7
-            if days_ahead == 0:
-                days_ahead = 14  # Skip to next bi-weekly occurrence
-            
-            current_date += timedelta(days=days_ahead)
-            
-            while current_date <= end_date:
-                forecast_dates.append(current_date)
-                current_date += timedelta(days=14)
+        start_date = max(last_date, today)  # Don't forecast in the past
         
-        elif timing_pattern.pattern_type == 'monthly':
-            # Monthly pattern - same day of month
-            target_day = timing_pattern.day_of_month if timing_pattern.day_of_month is not None else last_date.day
-            
-            # Move to next month
-            if current_date.month == 12:
-                next_month = current_date.replace(year=current_date.year + 1, month=1)
-            else:
-                next_month = current_date.replace(month=current_date.month + 1)
-            
-            # Adjust for target day
-            try:
-                current_date = next_month.replace(day=target_day)
-            except ValueError:
-                # Handle end-of-month cases (e.g., Feb 30 -> Feb 28)
-                last_day = calendar.monthrange(next_month.year, next_month.month)[1]
-                current_date = next_month.replace(day=min(target_day, last_day))
-            
-            while current_date <= end_date:
-                forecast_dates.append(current_date)
-                
-                # Move to next month
-                if current_date.month == 12:
-                    next_month = current_date.replace(year=current_date.year + 1, month=1, day=1)
-                else:
-                    next_month = current_date.replace(month=current_date.month + 1, day=1)
-                
-                try:
-                    current_date = next_month.replace(day=target_day)
-                except ValueError:
-                    last_day = calendar.monthrange(next_month.year, next_month.month)[1]
-                    current_date = next_month.replace(day=min(target_day, last_day))
-        
-        elif timing_pattern.pattern_type == 'quarterly':
-            # Quarterly pattern - every 3 months
-            while current_date <= end_date:
-                # Move to next quarter
-                if current_date.month <= 3:
-                    current_date = current_date.replace(month=4)
-                elif current_date.month <= 6:
-                    current_date = current_date.replace(month=7)
-                elif current_date.month <= 9:
-                    current_date = current_date.replace(month=10)
-                else:
-                    current_date = current_date.replace(year=current_date.year + 1, month=1)
-                
-                if current_date <= end_date:
-                    forecast_dates.append(current_date)
-        
-        else:
-            # Irregular pattern - use average frequency
-            frequency_days = timing_pattern.frequency_days if timing_pattern.frequency_days > 0 else 30
-            
-            while current_date <= end_date:
-                current_date += timedelta(days=frequency_days)
-                forecast_dates.append(current_date)
-        
-        return forecast_dates
+        # Irregular patterns use the average frequency
+        build_dates = _FORECAST_DATE_BUILDERS.get(timing_pattern.pattern_type, _irregular_dates)
+        return build_dates(start_date, end_date, last_date, timing_pattern).astype(object).tolist()
+    
+    @staticmethod
+    def _to_database_record(forecast: ForecastRecord, client_id: str) -> Dict:
+        """Map a ForecastRecord onto a forecasts table row"""
+        return {
+            'client_id': client_id,
+            'vendor_group_name': forecast.vendor_name,  # Using vendor_group_name column
+            'forecast_date': forecast.forecast_date.isoformat(),
+            'forecast_amount': forecast.predicted_amount,  # Using forecast_amount column
+            'forecast_type': 'scheduled',  # Type of forecast
+            'forecast_method': 'auto',  # How it was generated
+            'pattern_confidence': forecast.confidence,  # Confidence score
+            'is_locked': False,  # Not locked by default
+            'is_manual_override': False  # Not a manual override
+        }
     
     def save_forecasts_to_database(self, forecasts: List[ForecastRecord], client_id: str):
         """Save generated forecasts to database"""
@@ -207,30 +212,35 @@ class AutoForecastGenerator:
         print("=" * 80)
         
         # Clear existing auto-generated forecasts for this client
-        supabase.table('forecasts').delete().eq('client_id', client_id).eq('forecast_method', 'auto').execute()
+        supabase.table('forecasts').delete(returning='minimal').eq('client_id', client_id).eq('forecast_method', 'auto').execute()
+        
+        # Records are built batch by batch rather than materialized as one list
+        records = (self._to_database_record(forecast, client_id) for forecast in forecasts)
         
-        # Prepare forecast records for database
-        forecast_records = []
-        for forecast in forecasts:
-            record = {
-                'client_id': client_id,
-                'vendor_group_name': forecast.vendor_name,  # Using vendor_group_name column
-                'forecast_date': forecast.forecast_date.isoformat(),
-                'forecast_amount': forecast.predicted_amount,  # Using forecast_amount column
-                'forecast_type': 'scheduled',  # Type of forecast
-                'forecast_method': 'auto',  # How it was generated
-                'pattern_confidence': forecast.confidence,  # Confidence score
-                'is_locked': False,  # Not locked by default
-                'is_manual_override': False  # Not a manual override
-            }
-            forecast_records.append(record)
+        # Batch insert forecasts; return=minimal skips echoing the rows back.
+        # A failed batch is reported rather than aborting the rest, since the
+        # old auto forecasts are already gone
+        saved = 0
+        failed = 0
+        for batch in chunks(records):
+            try:
+                supabase.table('forecasts').insert(batch, returning='minimal').execute()
+                saved += len(batch)
+            except Exception as e:
+                failed += len(batch)
+                vendors = ', '.join(sorted({record['vendor_group_name'] for record in batch}))
+                print(f"❌ Error saving {len(batch)} forecast records: {str(e)}")
+                print(f"   Not saved for: {vendors}")
         
-        # Batch insert forecasts
-        if forecast_records:
-            supabase.table('forecasts').insert(forecast_records).execute()
-            print(f"✅ Saved {len(forecast_records)} forecast records to database")
+        if failed:
+            print(f"⚠️ Saved {saved} of {saved + failed} forecast records; auto forecasts for {client_id} are incomplete")
+        elif saved:
+            print(f"✅ Saved {saved} forecast records to database")
         else:
             print("⚠️ No forecasts to save")
+        
+        # Next generation run re-analyzes against the saved state
+        pattern_cache.pop(client_id)
     
     def print_forecast_summary(self, forecasts: List[ForecastRecord]):
         """Print formatted forecast summary"""
@@ -239,25 +249,29 @@ class AutoForecastGenerator:
             print("No forecasts generated")
             return
         
-        # Group by vendor
-        vendor_forecasts = {}
-        for forecast in forecasts:
-            if forecast.vendor_name not in vendor_forecasts:
-                vendor_forecasts[forecast.vendor_name] = []
-            vendor_forecasts[forecast.vendor_name].append(forecast)
+        # Group by vendor, keeping vendors in generation order; each vendor's
+        # records are date-ordered, so 'first' is its next forecast
+        df = pd.DataFrame.from_records(
+            map(attrgetter('vendor_name', 'forecast_date', 'predicted_amount', 'confidence'), forecasts),
+            columns=['vendor_name', 'forecast_date', 'predicted_amount', 'confidence']
+        )
+        summary = df.groupby('vendor_name', sort=False).agg(
+            events=('predicted_amount', 'size'),
+            total=('predicted_amount', 'sum'),
+            avg_confidence=('confidence', 'mean'),
+            next_date=('forecast_date', 'first'),
+            next_amount=('predicted_amount', 'first')
+        )
         
         print(f"\n📊 FORECAST SUMMARY")
         print("=" * 80)
         
-        for vendor_name, vendor_forecasts_list in vendor_forecasts.items():
-            total_amount = sum(f.predicted_amount for f in vendor_forecasts_list)
-            avg_confidence = sum(f.confidence for f in vendor_forecasts_list) / len(vendor_forecasts_list)
-            
-            print(f"\n├── {vendor_name}")
-            print(f"│   ├── {len(vendor_forecasts_list)} forecast events")
-            print(f"│   ├── ${total_amount:,.0f} total predicted")
-            print(f"│   ├── {avg_confidence:.1%} average confidence")
-            print(f"│   └── Next: {vendor_forecasts_list[0].forecast_date} (${vendor_forecasts_list[0].predicted_amount:,.0f})")
+        for row in summary.itertuples():
+            print(f"\n├── {row.Index}")
+            print(f"│   ├── {row.events} forecast events")
+            print(f"│   ├── ${row.total:,.0f} total predicted")
+            print(f"│   ├── {row.avg_confidence:.1%} average confidence")
+            print(f"│   └── Next: {row.next_date} (${row.next_amount:,.0f})")
 
 def main():
     """Test the auto-forecast generator"""
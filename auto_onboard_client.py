@@ -4,6 +4,7 @@ Automated Client Onboarding
 Runs without manual input for testing
 """
 
+import re
 import sys
 import argparse
 import json
@@ -12,9 +13,34 @@ from datetime import datetime, date
 sys.path.append('.')
 
 from supabase_client import supabase
+from utils.batching import chunks
 from practical_pattern_detection import PracticalPatternDetection
 from integrated_forecast_display import generate_integrated_forecast_display
 
+# Vendor name keywords per group, checked in order (first match wins);
+# unmatched vendors go to Operations
+VENDOR_GROUP_RULES = [
+    ('Amex Payments', r'amex'),
+    ('Revenue - Shopify', r'shopify|shoppay'),
+    ('Revenue - Other', r'stripe|bestselfco'),
+    ('International Vendors', r'ltd|co\.,ltd|international|hk|wise'),
+    ('Professional Services', r'llp|llc|solutions|innovations'),
+    ('Banking Fees', r'fee|mercury|checking')
+]
+
+# All rules in one regex. Each branch is a lookahead with its own named
+# group, so rule order (not match position) decides m.lastgroup
+VENDOR_GROUP_SCANNER = re.compile('^(?:' + '|'.join(
+    f'(?=.*(?:{pattern}))(?P<g{i}>)' for i, (_, pattern) in enumerate(VENDOR_GROUP_RULES)
+) + ')', re.IGNORECASE | re.DOTALL)
+
+def classify_vendor_group(vendor: str) -> str:
+    """Vendor group name for a vendor, per VENDOR_GROUP_RULES"""
+    m = VENDOR_GROUP_SCANNER.match(vendor)
+    if m is None:
+        return 'Operations'
+    return VENDOR_GROUP_RULES[int(m.lastgroup[1:])][0]
+
 class AutoClientOnboarding:
     """Automated onboarding that simulates user input"""
     
@@ -68,18 +94,29 @@ class AutoClientOnboarding:
         print(f"✅ Found {count} transactions")
         return True
     
+    def _upsert_in_batches(self, table: str, records: list) -> int:
+        """Upsert records a batch per request; returns how many were saved"""
+        saved = 0
+        for batch in chunks(records):
+            try:
+                supabase.table(table).upsert(batch, returning='minimal').execute()
+                saved += len(batch)
+            except Exception as e:
+                # Name the batch's vendors so they can be retried
+                vendors = ', '.join(record['vendor_name'] for record in batch)
+                print(f"   ❌ Error saving {len(batch)} {table} rows: {str(e)}")
+                print(f"      Not saved: {vendors}")
+        return saved
+    
     def _auto_vendor_grouping(self) -> dict:
         """Automatically create sensible vendor groups"""
         print("\n🗂️ AUTO VENDOR GROUPING")
         print("-" * 60)
         
-        # Get unique vendors
-        result = supabase.table('transactions')\
-            .select('vendor_name')\
-            .eq('client_id', self.client_id)\
-            .execute()
+        # Get unique vendors, deduplicated in the database
+        result = supabase.rpc('get_distinct_vendor_names', {'p_client_id': self.client_id}).execute()
         
-        vendors = list(set(row['vendor_name'] for row in result.data))
+        vendors = [row['vendor_name'] for row in result.data]
         
         # Create smart groups
         groups = {
@@ -93,38 +130,15 @@ class AutoClientOnboarding:
         }
         
         for vendor in vendors:
-            vendor_lower = vendor.lower()
-            
-            # Group by patterns
-            if 'amex' in vendor_lower:
-                groups['Amex Payments'].append(vendor)
-            elif 'shopify' in vendor_lower or 'shoppay' in vendor_lower:
-                groups['Revenue - Shopify'].append(vendor)
-            elif 'stripe' in vendor_lower or 'bestselfco' in vendor_lower:
-                groups['Revenue - Other'].append(vendor)
-            elif any(x in vendor_lower for x in ['ltd', 'co.,ltd', 'international', 'hk', 'wise']):
-                groups['International Vendors'].append(vendor)
-            elif any(x in vendor_lower for x in ['llp', 'llc', 'solutions', 'innovations']):
-                groups['Professional Services'].append(vendor)
-            elif any(x in vendor_lower for x in ['fee', 'mercury', 'checking']):
-                groups['Banking Fees'].append(vendor)
-            else:
-                groups['Operations'].append(vendor)
+            groups[classify_vendor_group(vendor)].append(vendor)
         
         # Save to database
-        saved = 0
-        for group_name, vendors in groups.items():
-            for vendor in vendors:
-                record = {
-                    'client_id': self.client_id,
-                    'group_name': group_name,
-                    'vendor_name': vendor
-                }
-                try:
-                    supabase.table('vendor_groups').upsert(record).execute()
-                    saved += 1
-                except Exception as e:
-                    print(f"   ❌ Error saving {vendor}: {str(e)}")
+        records = [
+            {'client_id': self.client_id, 'group_name': group_name, 'vendor_name': vendor}
+            for group_name, vendors in groups.items()
+            for vendor in vendors
+        ]
+        saved = self._upsert_in_batches('vendor_groups', records)
         
         print(f"✅ Created {len([g for g in groups.values() if g])} groups")
         print(f"📊 Grouped {saved} vendors")
@@ -144,28 +158,24 @@ class AutoClientOnboarding:
         patterns = self.pattern_detector.analyze_vendor_patterns(self.client_id)
         
         # Save to pattern_analysis table
-        saved = 0
+        records = []
         for vendor_name, pattern in patterns.items():
-            try:
-                record = {
-                    'client_id': self.client_id,
-                    'vendor_name': vendor_name,
-                    'pattern_type': pattern.timing_pattern.pattern_type,
-                    'frequency_days': pattern.timing_pattern.frequency_days,
-                    'confidence_score': 0.8 if pattern.forecast_recommendation == 'auto' else 0.5,
-                    'last_analyzed': datetime.now().isoformat(),
-                    'analysis_data': json.dumps({
-                        'median_gap': pattern.timing_pattern.median_gap,
-                        'amount_variance': pattern.amount_pattern.variance_coefficient,
-                        'recommendation': pattern.forecast_recommendation,
-                        'reasoning': pattern.reasoning
-                    })
-                }
-                
-                supabase.table('pattern_analysis').upsert(record).execute()
-                saved += 1
-            except Exception as e:
-                print(f"   ❌ Error saving pattern for {vendor_name}: {str(e)}")
+            records.append({
+                'client_id': self.client_id,
+                'vendor_name': vendor_name,
+                'pattern_type': pattern.timing_pattern.pattern_type,
+                'frequency_days': pattern.timing_pattern.frequency_days,
+                'confidence_score': 0.8 if pattern.forecast_recommendation == 'auto' else 0.5,
+                'last_analyzed': datetime.now().isoformat(),
+                'analysis_data': json.dumps({
+                    'median_gap': pattern.timing_pattern.median_gap,
+                    'amount_variance': pattern.amount_pattern.variance_coefficient,
+                    'recommendation': pattern.forecast_recommendation,
+                    'reasoning': pattern.reasoning
+                })
+            })
+        
+        saved = self._upsert_in_batches('pattern_analysis', records)
         
         # Summary
         auto_count = sum(1 for p in patterns.values() if p.forecast_recommendation == 'auto')
@@ -184,25 +194,20 @@ class AutoClientOnboarding:
         print("\n⚙️ AUTO FORECAST CONFIGURATION")
         print("-" * 60)
         
-        configured = 0
-        
         # Configure all vendors automatically
+        configs = []
         for vendor_name, pattern in patterns.items():
             if pattern.forecast_recommendation in ['auto', 'manual_review']:
-                config = {
+                configs.append({
                     'client_id': self.client_id,
                     'vendor_name': vendor_name,
                     'forecast_type': pattern.timing_pattern.pattern_type,
                     'forecast_amount': float(pattern.amount_pattern.suggested_amount),
                     'is_active': True,
                     'created_at': datetime.now().isoformat()
-                }
-                
-                try:
-                    supabase.table('forecast_config').upsert(config).execute()
-                    configured += 1
-                except Exception as e:
-                    print(f"   ❌ Error configuring {vendor_name}: {str(e)}")
+                })
+        
+        configured = self._upsert_in_batches('forecast_config', configs)
         
         print(f"✅ Configured {configured} vendor forecasts")
     
@@ -229,18 +234,18 @@ class AutoClientOnboarding:
         # Show key metrics
         print("\n📈 Key Metrics:")
         
-        # Transaction count by vendor group
-        for group_name in ['Revenue - Shopify', 'Revenue - Other', 'Amex Payments']:
-            result = supabase.table('transactions')\
-                .select('amount')\
-                .eq('client_id', self.client_id)\
-                .in_('vendor_name', vendor_groups.get(group_name, []))\
-                .execute()
-            
-            if result.data:
-                total = sum(abs(float(r['amount'])) for r in result.data)
-                count = len(result.data)
-                print(f"   - {group_name}: ${total:,.0f} ({count} transactions)")
+        # Transaction count by vendor group, summed in the database
+        group_names = ['Revenue - Shopify', 'Revenue - Other', 'Amex Payments']
+        result = supabase.rpc('get_group_totals', {
+            'p_client_id': self.client_id,
+            'p_groups': {name: vendor_groups.get(name, []) for name in group_names}
+        }).execute()
+        totals = {row['group_name']: row for row in result.data or []}
+        
+        for group_name in group_names:
+            row = totals.get(group_name)
+            if row:
+                print(f"   - {group_name}: ${float(row['total']):,.0f} ({row['transaction_count']} transactions)")
 
 
 def main():
@@ -0,0 +1,216 @@
+-- Aggregation functions used by the analysis scripts
+-- Run in the Supabase SQL editor; called via supabase.rpc(...)
+
+-- Distinct (display name, month) pairs with activity since p_start_date.
+-- Unmapped vendors come back with is_mapped = false so the caller can
+-- apply normalize_vendor_name() to them.
+CREATE OR REPLACE FUNCTION get_vendor_month_activity(p_client_id TEXT, p_start_date DATE)
+RETURNS TABLE (display TEXT, is_mapped BOOLEAN, month TEXT) AS $$
+    SELECT
+        COALESCE(NULLIF(v.display_name, ''), t.vendor_name) AS display,
+        NULLIF(v.display_name, '') IS NOT NULL AS is_mapped,
+        to_char(t.transaction_date, 'YYYY-MM') AS month
+    FROM transactions t
+    LEFT JOIN vendors v
+        ON v.client_id = t.client_id AND v.vendor_name = t.vendor_name
+    WHERE t.client_id = p_client_id
+      AND t.transaction_date >= p_start_date
+    GROUP BY 1, 2, 3;
+$$ LANGUAGE sql STABLE;
+
+-- Distinct client ids that have transactions
+CREATE OR REPLACE FUNCTION get_distinct_client_ids()
+RETURNS TABLE (client_id TEXT) AS $$
+    SELECT DISTINCT t.client_id
+    FROM transactions t
+    WHERE t.client_id IS NOT NULL
+    ORDER BY 1;
+$$ LANGUAGE sql STABLE;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_client_id ON transactions(client_id);
+
+-- Per-client transaction summary: counts, date range, totals
+CREATE OR REPLACE FUNCTION client_transaction_summary(p_client_id TEXT, p_recent_since DATE)
+RETURNS TABLE (
+    cnt BIGINT,
+    earliest DATE,
+    latest DATE,
+    total NUMERIC,
+    months BIGINT,
+    recent BIGINT
+) AS $$
+    SELECT
+        count(*),
+        min(transaction_date),
+        max(transaction_date),
+        coalesce(sum(amount), 0),
+        count(DISTINCT to_char(transaction_date, 'YYYY-MM')),
+        count(*) FILTER (WHERE transaction_date >= p_recent_since)
+    FROM transactions
+    WHERE client_id = p_client_id;
+$$ LANGUAGE sql STABLE;
+
+-- Transactions for every vendor mapped to a display name, resolved with a
+-- join instead of a separate vendors lookup round trip. Returns up to p_limit
+-- rows after the (p_after_date, p_after_id) keyset, ordered by the unique
+-- (transaction_date, id), so callers page past the 1000-row response cap.
+-- The drop removes the earlier unpaged signature
+DROP FUNCTION IF EXISTS get_display_name_transactions(TEXT, TEXT);
+CREATE OR REPLACE FUNCTION get_display_name_transactions(
+    p_client_id TEXT,
+    p_display_name TEXT,
+    p_after_date DATE DEFAULT NULL,
+    p_after_id INTEGER DEFAULT NULL,
+    p_limit INT DEFAULT 1000
+)
+RETURNS TABLE (id INTEGER, transaction_date DATE, amount NUMERIC, vendor_name TEXT) AS $$
+    SELECT t.id, t.transaction_date, t.amount, t.vendor_name
+    FROM transactions t
+    JOIN vendors v
+        ON v.client_id = t.client_id AND v.vendor_name = t.vendor_name
+    WHERE t.client_id = p_client_id
+      AND v.display_name = p_display_name
+      AND (p_after_date IS NULL OR (t.transaction_date, t.id) > (p_after_date, p_after_id))
+    ORDER BY t.transaction_date, t.id
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
+
+-- Busiest vendors for a client, so callers only fetch rows for the vendors
+-- they will actually analyze
+CREATE OR REPLACE FUNCTION get_top_vendor_counts(p_client_id TEXT, p_limit INT, p_min_count INT DEFAULT 1)
+RETURNS TABLE (vendor_name TEXT, txn_count BIGINT) AS $$
+    SELECT t.vendor_name, count(*) AS txn_count
+    FROM transactions t
+    WHERE t.client_id = p_client_id
+    GROUP BY t.vendor_name
+    HAVING count(*) >= p_min_count
+    ORDER BY txn_count DESC, t.vendor_name
+    LIMIT p_limit;
+$$ LANGUAGE sql STABLE;
+
+-- Keyset pagination for /api/transactions walks this order; see utils/pagination.py
+DROP INDEX IF EXISTS idx_transactions_client_date_id;
+CREATE INDEX IF NOT EXISTS idx_transactions_client_date_id
+    ON transactions(client_id, transaction_date DESC, id DESC);
+
+-- Every vendor group's transactions for a period in one call, one row per
+-- group with date-ordered arrays so large clients stay under the row cap
+CREATE OR REPLACE FUNCTION get_vendor_group_transaction_arrays(p_client_id TEXT, p_start_date DATE, p_end_date DATE)
+RETURNS TABLE (vendor_group_id INTEGER, transaction_dates DATE[], amounts NUMERIC[]) AS $$
+    SELECT
+        m.vendor_group_id,
+        array_agg(t.transaction_date ORDER BY t.transaction_date),
+        array_agg(t.amount ORDER BY t.transaction_date)
+    FROM vendor_group_mappings m
+    JOIN vendor_groups g
+        ON g.id = m.vendor_group_id AND g.client_id = p_client_id
+    JOIN transactions t
+        ON t.client_id = p_client_id AND t.vendor_name = m.vendor_name
+    WHERE t.transaction_date BETWEEN p_start_date AND p_end_date
+    GROUP BY m.vendor_group_id;
+$$ LANGUAGE sql STABLE;
+
+-- Forecast totals per week and cash flow bucket for the simplified engine, so
+-- only O(weeks x buckets) rows leave the database. Categorization and
+-- frequency eligibility mirror SimplifiedForecastEngine._categorize_vendor_frame
+-- and accumulate_forecasts; keep the two in sync
+CREATE OR REPLACE FUNCTION forecast_buckets(p_client_id TEXT, p_start_date DATE, p_weeks INT)
+RETURNS TABLE (week_start DATE, category TEXT, subcategory TEXT, forecasted NUMERIC) AS $$
+    WITH weeks AS (
+        SELECT (p_start_date + 7 * n)::date AS week_start
+        FROM generate_series(0, p_weeks - 1) AS n
+    ),
+    categorized AS (
+        SELECT
+            coalesce(v.forecast_amount, 0) AS forecast_amount,
+            coalesce(v.forecast_frequency, 'monthly') AS frequency,
+            -- forecast_day is TEXT: blank defaults to Monday, anything
+            -- non-numeric gets -1 (never matches) instead of failing the cast
+            CASE
+                WHEN v.forecast_day ~ '^\d{1,2}$' THEN v.forecast_day::int
+                WHEN coalesce(v.forecast_day, '') = '' THEN 0
+                ELSE -1
+            END AS forecast_day,
+            CASE
+                WHEN (coalesce(v.is_revenue, false) OR n.name ~ 'AMAZON|SHOPIFY|STRIPE|PAYPAL')
+                     AND n.name ~ 'CORE|CAPITAL|INVESTMENT' THEN 'revenue:core_capital'
+                WHEN coalesce(v.is_revenue, false) OR n.name ~ 'AMAZON|SHOPIFY|STRIPE|PAYPAL'
+                     THEN 'revenue:operating_revenue'
+                WHEN n.name ~ 'AMEX|AMERICAN EXPRESS|CHASE CREDIT|CREDIT CARD' THEN 'operating:cc'
+                WHEN n.name ~ 'FACEBOOK|GOOGLE|ADS|MARKETING' THEN 'operating:ops'
+                WHEN n.name ~ 'QUICKBOOKS|OFFICE|UTILITIES' THEN 'operating:ga'
+                WHEN n.name ~ 'GUSTO|PAYROLL|SALARY|WAGE' THEN 'operating:payroll'
+                WHEN n.name ~ 'ADMIN|MISC|OTHER' THEN 'operating:admin'
+                WHEN n.name ~ 'DISTRIBUTION|OWNER' THEN 'financing:distributions'
+                WHEN n.name ~ 'LOAN|DEBT|PAYMENT' THEN 'financing:loan_payments'
+                WHEN n.name ~ 'EQUITY|INVESTMENT|CAPITAL INJECTION' THEN 'financing:equity_contrib'
+                -- Default based on amount sign
+                WHEN coalesce(v.forecast_amount, 0) > 0 THEN 'revenue:operating_revenue'
+                ELSE 'operating:ops'
+            END AS bucket
+        FROM vendors v
+        CROSS JOIN LATERAL (SELECT upper(coalesce(v.vendor_name, '')) AS name) n
+        WHERE v.client_id = p_client_id
+    )
+    SELECT
+        w.week_start,
+        split_part(c.bucket, ':', 1),
+        split_part(c.bucket, ':', 2),
+        sum(c.forecast_amount)
+    FROM categorized c
+    CROSS JOIN weeks w
+    WHERE CASE c.frequency
+        WHEN 'daily' THEN extract(isodow FROM w.week_start) <= 5
+        WHEN 'weekly' THEN extract(isodow FROM w.week_start) - 1 = c.forecast_day
+        WHEN 'bi-weekly' THEN extract(week FROM w.week_start)::int % 2 = 0
+        ELSE extract(day FROM w.week_start) <= 7  -- monthly and the default
+    END
+    GROUP BY w.week_start, c.bucket;
+$$ LANGUAGE sql STABLE;
+
+-- Last transaction date per vendor, so forecast generation makes one call
+-- instead of fetching each vendor's full history
+CREATE OR REPLACE FUNCTION get_last_transaction_dates(p_client_id TEXT, p_vendor_names TEXT[])
+RETURNS TABLE (vendor_name TEXT, last_date DATE) AS $$
+    SELECT t.vendor_name, max(t.transaction_date)
+    FROM transactions t
+    WHERE t.client_id = p_client_id
+      AND t.vendor_name = ANY(p_vendor_names)
+    GROUP BY t.vendor_name;
+$$ LANGUAGE sql STABLE;
+
+-- Distinct vendor names for a client, so callers don't pull every
+-- transaction row just to deduplicate names
+CREATE OR REPLACE FUNCTION get_distinct_vendor_names(p_client_id TEXT)
+RETURNS TABLE (vendor_name TEXT) AS $$
+    SELECT DISTINCT t.vendor_name
+    FROM transactions t
+    WHERE t.client_id = p_client_id
+      AND t.vendor_name IS NOT NULL
+    ORDER BY 1;
+$$ LANGUAGE sql STABLE;
+
+-- Absolute transaction total and count per vendor group in one call;
+-- p_groups maps group name -> array of vendor names
+CREATE OR REPLACE FUNCTION get_group_totals(p_client_id TEXT, p_groups JSONB)
+RETURNS TABLE (group_name TEXT, total NUMERIC, transaction_count BIGINT) AS $$
+    SELECT g.key, sum(abs(t.amount)), count(*)
+    FROM jsonb_each(p_groups) g
+    CROSS JOIN LATERAL jsonb_array_elements_text(g.value) v(vendor_name)
+    JOIN transactions t
+      ON t.client_id = p_client_id
+     AND t.vendor_name = v.vendor_name
+    GROUP BY g.key;
+$$ LANGUAGE sql STABLE;
+
+-- Lock each named vendor as its own group (display name = vendor name);
+-- used by ai_group_vendors for payment processors
+CREATE OR REPLACE FUNCTION lock_vendors_as_own_group(p_client_id TEXT, p_vendor_names TEXT[])
+RETURNS void AS $$
+    UPDATE vendors
+    SET display_name = vendor_name,
+        vendor_group = vendor_name,
+        group_locked = true
+    WHERE client_id = p_client_id
+      AND vendor_name = ANY(p_vendor_names);
+$$ LANGUAGE sql;
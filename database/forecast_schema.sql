@@ -122,7 +122,8 @@ SELECT
     fr.is_actual,
     fr.is_locked,
     fr.pattern_type,
-    fr.forecast_method
+    fr.forecast_method,
+    fr.id  -- unique tiebreak for paging; new view columns must go last
 FROM forecast_records fr
 JOIN vendor_groups vg ON fr.vendor_group_id = vg.id
 ORDER BY fr.forecast_date, vg.category, vg.subcategory;
@@ -149,4 +150,30 @@ BEGIN
     (p_client_id, 'loan_proceeds', 'Loan Proceeds', 'financing', 'loan_proceeds', true),
     (p_client_id, 'loan_payments', 'Loan Payments', 'financing', 'loan_payments', false);
 END;
-$$ LANGUAGE plpgsql;
\ No newline at end of file
+$$ LANGUAGE plpgsql;
+
+-- Actual vs forecast comparison per week, computed in the background by
+-- POST /api/reconcile/compute and read back by GET /api/reconcile
+CREATE TABLE IF NOT EXISTS reconciliation_results (
+    id SERIAL PRIMARY KEY,
+    client_id TEXT NOT NULL,
+    week_start DATE NOT NULL,
+    week_end DATE NOT NULL,
+    actual_deposits DECIMAL(15,2),
+    actual_withdrawals DECIMAL(15,2),
+    actual_net DECIMAL(15,2),
+    forecasted_deposits DECIMAL(15,2),
+    forecasted_withdrawals DECIMAL(15,2),
+    forecasted_net DECIMAL(15,2),
+    -- Unbounded: a small forecast against a large actual goes far negative
+    deposit_accuracy NUMERIC,
+    withdrawal_accuracy NUMERIC,
+    transaction_count INTEGER,
+    computed_at TIMESTAMP DEFAULT NOW(),
+    UNIQUE(client_id, week_start)
+);
+
+-- Widen accuracy columns on tables created with the earlier DECIMAL(7,2)
+ALTER TABLE reconciliation_results
+    ALTER COLUMN deposit_accuracy TYPE NUMERIC,
+    ALTER COLUMN withdrawal_accuracy TYPE NUMERIC;
@@ -16,6 +16,12 @@ import numpy as np
 sys.path.append('.')
 from supabase_client import supabase
 
+# forecast_dashboard_view columns streamed by iter_forecast_rows
+FORECAST_ROW_COLUMNS = (
+    'id, forecast_date, group_name, display_name, category, subcategory, is_inflow, '
+    'forecasted_amount, actual_amount, variance_amount, is_actual, is_locked, pattern_type, forecast_method'
+)
+
 @dataclass
 class PatternResult:
     frequency: str  # 'daily', 'weekly', 'bi-weekly', 'monthly', 'quarterly', 'irregular'
@@ -50,12 +56,52 @@ class ForecastEngine:
         # Get all transactions for this vendor group
         transactions = self._get_vendor_group_transactions(vendor_group_id, start_date, end_date)
         
+        return self._detect_pattern(transactions)
+    
+    def detect_vendor_group_patterns(self, vendor_group_ids: List[int],
+                                     start_date: date = None,
+                                     end_date: date = None) -> Dict[int, PatternResult]:
+        """Detect patterns for many vendor groups from a single transactions query"""
+        
+        if not start_date:
+            start_date = date.today() - timedelta(days=90)  # 3 months default
+        if not end_date:
+            end_date = date.today()
+        
+        # One row per group with date-ordered arrays; see database/analysis_functions.sql
+        result = supabase.rpc('get_vendor_group_transaction_arrays', {
+            'p_client_id': self.client_id,
+            'p_start_date': start_date.isoformat(),
+            'p_end_date': end_date.isoformat()
+        }).execute()
+        
+        transactions_by_group = {
+            row['vendor_group_id']: [
+                {'transaction_date': txn_date, 'amount': amount}
+                for txn_date, amount in zip(row['transaction_dates'], row['amounts'])
+            ]
+            for row in result.data or []
+        }
+        
+        return {
+            vendor_group_id: self._detect_pattern(transactions_by_group.get(vendor_group_id, []))
+            for vendor_group_id in vendor_group_ids
+        }
+    
+    def refresh_vendor_group_forecast_rules(self, vendor_group_ids: List[int]) -> bool:
+        """Re-detect patterns for the groups and write all their rules (one read, one write)"""
+        
+        return self.update_vendor_group_forecast_rules(self.detect_vendor_group_patterns(vendor_group_ids))
+    
+    def _detect_pattern(self, transactions: List[Dict]) -> PatternResult:
+        """Pick the most confident pattern for one group's transactions"""
+        
         if len(transactions) < 3:
             return PatternResult('irregular', {}, Decimal('0'), 0.0, len(transactions))
         
         # Convert to DataFrame for analysis
         df = pd.DataFrame(transactions)
-        df['transaction_date'] = pd.to_datetime(df['transaction_date'])
+        df['transaction_date'] = pd.to_datetime(df['transaction_date'], format='%Y-%m-%d', cache=True)
         df['amount'] = df['amount'].abs()  # Use absolute values for pattern detection
         
         # Try different pattern detection methods
@@ -236,10 +282,42 @@ class ForecastEngine:
         if not pattern:
             pattern = self.detect_vendor_group_pattern(vendor_group_id)
         
+        # Upsert forecast rule
+        rule_data = self._forecast_rule_row(vendor_group_id, pattern, manual_amount)
+        
+        try:
+            # Try update first
+            result = supabase.table('vendor_forecast_rules').upsert(rule_data).execute()
+            return True
+        except Exception as e:
+            print(f"Error updating forecast rule: {e}")
+            return False
+    
+    def update_vendor_group_forecast_rules(self, patterns: Dict[int, PatternResult]) -> bool:
+        """Upsert forecast rules for many vendor groups in a single request"""
+        
+        if not patterns:
+            return True
+        
+        rules = [
+            self._forecast_rule_row(vendor_group_id, pattern)
+            for vendor_group_id, pattern in patterns.items()
+        ]
+        
+        try:
+            supabase.table('vendor_forecast_rules').upsert(rules, on_conflict='client_id,vendor_group_id').execute()
+            return True
+        except Exception as e:
+            print(f"Error updating forecast rules: {e}")
+            return False
+    
+    def _forecast_rule_row(self, vendor_group_id: int, pattern: PatternResult,
+                           manual_amount: Decimal = None) -> Dict:
+        """Build the vendor_forecast_rules row for a detected pattern"""
+        
         base_amount = manual_amount if manual_amount else pattern.avg_amount
         
-        # Upsert forecast rule
-        rule_data = {
+        return {
             'client_id': self.client_id,
             'vendor_group_id': vendor_group_id,
             'frequency': pattern.frequency,
@@ -249,14 +327,6 @@ class ForecastEngine:
             'is_active': True,
             'last_pattern_update': datetime.now().isoformat()
         }
-        
-        try:
-            # Try update first
-            result = supabase.table('vendor_forecast_rules').upsert(rule_data).execute()
-            return True
-        except Exception as e:
-            print(f"Error updating forecast rule: {e}")
-            return False
     
     def generate_forecasts(self, start_date: date = None, weeks: int = 12) -> List[ForecastRecord]:
         """Generate forecast records for all vendor groups"""
@@ -432,6 +502,47 @@ class ForecastEngine:
             print(f"❌ Error saving forecasts: {e}")
             return False
     
+    def iter_forecast_rows(self, start_date: date = None, weeks: int = 12,
+                           page_size: int = 1000):
+        """
+        Yield forecast_dashboard_view rows for the period page by page, without
+        materializing them.
+        
+        Rows come in (forecast_date, id) order and each page resumes after the
+        previous page's last key, like utils/pagination.py, so later pages cost
+        the same as the first instead of re-reading every skipped row.
+        """
+        
+        if not start_date:
+            # Start from this Monday
+            today = date.today()
+            start_date = today - timedelta(days=today.weekday())
+        
+        end_date = start_date + timedelta(weeks=weeks)
+        last_row = None
+        
+        while True:
+            query = supabase.table('forecast_dashboard_view').select(FORECAST_ROW_COLUMNS).eq(
+                'client_id', self.client_id
+            ).gte('forecast_date', start_date.isoformat()).lte(
+                'forecast_date', end_date.isoformat()
+            )
+            if last_row:
+                last_date = last_row['forecast_date']
+                query = query.or_(
+                    f"forecast_date.gt.{last_date},"
+                    f"and(forecast_date.eq.{last_date},id.gt.{int(last_row['id'])})"
+                )
+            
+            result = query.order('forecast_date').order('id').limit(page_size).execute()
+            page = result.data or []
+            
+            yield from page
+            
+            if len(page) < page_size:
+                break
+            last_row = page[-1]
+    
     def get_forecast_dashboard_data(self, start_date: date = None, weeks: int = 12) -> Dict:
         """Get formatted data for the forecast dashboard"""
         
@@ -11,6 +11,21 @@ from supabase_client import supabase
 
 logger = logging.getLogger(__name__)
 
+def _fetch_pages(make_query, page_size: int) -> List[Dict[str, Any]]:
+    """
+    All rows of an ordered query, `page_size` rows per request so results aren't
+    cut off at PostgREST's row cap. `make_query` builds a fresh query each call;
+    its ordering must be unique.
+    """
+    rows = []
+    offset = 0
+    while True:
+        page = make_query().range(offset, offset + page_size - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        offset += page_size
+
 class TempVendorGroupManager:
     """Temporary vendor group management using existing vendors table."""
     
@@ -73,22 +88,30 @@ class TempVendorGroupManager:
             return []
     
     def get_vendor_group_transactions(self, client_id: str, display_names: List[str], 
-                                    days_back: int = 90) -> List[Dict[str, Any]]:
-        """Get all transactions for vendors with these display names."""
+                                    days_back: int = 90,
+                                    columns: str = 'transaction_date, amount, vendor_name, description',
+                                    page_size: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Get all transactions for vendors with these display names, newest first.
+        
+        Each row is tagged with its 'display_name'; `columns` must include
+        vendor_name for that. Rows are fetched a page at a time so large groups
+        aren't cut off at PostgREST's response row cap.
+        """
         try:
-            # Get all vendor names that map to these display names
-            all_vendor_names = []
-            for display_name in display_names:
-                vendor_result = supabase.table('vendors').select('vendor_name').eq(
+            # Get all vendor names that map to these display names; paged too, since
+            # every display name shares this one lookup's row cap
+            vendors = _fetch_pages(
+                lambda: supabase.table('vendors').select('vendor_name, display_name').eq(
                     'client_id', client_id
-                ).eq(
-                    'display_name', display_name
-                ).execute()
-                
-                vendor_names = [v['vendor_name'] for v in vendor_result.data]
-                all_vendor_names.extend(vendor_names)
+                ).in_(
+                    'display_name', display_names
+                ).order('id'),
+                page_size
+            )
             
-            if not all_vendor_names:
+            display_by_vendor = {v['vendor_name']: v['display_name'] for v in vendors}
+            if not display_by_vendor:
                 logger.warning(f"No vendor names found for display names: {display_names}")
                 return []
             
@@ -96,21 +119,25 @@ class TempVendorGroupManager:
             end_date = datetime.now().date()
             start_date = end_date - timedelta(days=days_back)
             
-            # Get transactions for all vendor names
-            txn_result = supabase.table('transactions').select(
-                'transaction_date, amount, vendor_name, description'
-            ).eq(
-                'client_id', client_id
-            ).in_(
-                'vendor_name', all_vendor_names
-            ).gte(
-                'transaction_date', start_date.isoformat()
-            ).lte(
-                'transaction_date', end_date.isoformat()
-            ).order('transaction_date', desc=True).execute()
+            # Get transactions for all vendor names; id breaks date ties so pages don't overlap
+            transactions = _fetch_pages(
+                lambda: supabase.table('transactions').select(columns).eq(
+                    'client_id', client_id
+                ).in_(
+                    'vendor_name', list(display_by_vendor)
+                ).gte(
+                    'transaction_date', start_date.isoformat()
+                ).lte(
+                    'transaction_date', end_date.isoformat()
+                ).order('transaction_date', desc=True).order('id', desc=True),
+                page_size
+            )
+            
+            for txn in transactions:
+                txn['display_name'] = display_by_vendor.get(txn['vendor_name'])
             
-            logger.info(f"Found {len(txn_result.data)} transactions for group with {len(display_names)} display names")
-            return txn_result.data
+            logger.info(f"Found {len(transactions)} transactions for group with {len(display_names)} display names")
+            return transactions
             
         except Exception as e:
             logger.error(f"Error getting transactions for display names {display_names}: {e}")
@@ -8,6 +8,7 @@ import sys
 sys.path.append('.')
 
 from supabase_client import supabase
+from utils.ttl_cache import TTLCache
 from datetime import datetime, date, timedelta
 from collections import defaultdict, Counter
 from dataclasses import dataclass
@@ -44,6 +45,10 @@ class VendorPattern:
     forecast_recommendation: str  # auto, manual, skip
     reasoning: str
 
+# analyze_vendor_patterns results per client, so a generation run that asks
+# again within a few minutes reuses the analysis instead of redoing it
+pattern_cache = TTLCache(maxsize=32, ttl=300)
+
 class PatternDetectionEngine:
     """Analyzes vendor transaction patterns for forecasting"""
     
@@ -54,7 +59,10 @@ class PatternDetectionEngine:
         self.CONFIDENCE_THRESHOLD = 0.6  # Minimum confidence for auto-forecasting
     
     def analyze_vendor_patterns(self, client_id: str) -> Dict[str, VendorPattern]:
-        """Main entry point - analyze all regular vendors for patterns"""
+        """Main entry point - analyze all regular vendors for patterns (cached for 5 minutes)"""
+        return pattern_cache.get_or_load(client_id, lambda: self._analyze_vendor_patterns(client_id))
+    
+    def _analyze_vendor_patterns(self, client_id: str) -> Dict[str, VendorPattern]:
         print("🔍 PATTERN DETECTION ENGINE")
         print("=" * 80)
         
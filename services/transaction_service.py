@@ -5,8 +5,9 @@ Handles database operations for transactions including imports and duplicate det
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Sequence
 from datetime import datetime
+import pandas as pd
 from supabase_client import supabase
 from importers.base import TransactionData, ImportResult
 
@@ -192,6 +193,58 @@ class TransactionService:
             logger.warning(f"Error checking for duplicates: {e}")
             return False
     
+    def fetch_transactions_frame(self, client_id: str,
+                                 columns: Sequence[str] = ('transaction_date', 'amount', 'vendor_name'),
+                                 start_date: Optional[str] = None,
+                                 end_date: Optional[str] = None,
+                                 vendor_names: Optional[List[str]] = None,
+                                 income_only: bool = False,
+                                 descending: bool = False,
+                                 page_size: int = 1000) -> pd.DataFrame:
+        """
+        Fetch transactions page by page into a typed DataFrame.
+        
+        Only `columns` are requested. Rows are accumulated column-wise rather
+        than kept as per-row dicts; transaction_date comes back as datetime64
+        and amount as float64.
+        """
+        values: Dict[str, list] = {col: [] for col in columns}
+        offset = 0
+        
+        while True:
+            query = self.supabase.table('transactions').select(', '.join(columns)).eq(
+                'client_id', client_id
+            )
+            if start_date:
+                query = query.gte('transaction_date', start_date)
+            if end_date:
+                query = query.lte('transaction_date', end_date)
+            if vendor_names is not None:
+                query = query.in_('vendor_name', vendor_names)
+            if income_only:
+                query = query.gt('amount', 0)
+            
+            # id breaks ties between same-date rows so pages don't overlap or skip
+            result = query.order('transaction_date', desc=descending) \
+                .order('id', desc=descending) \
+                .range(offset, offset + page_size - 1) \
+                .execute()
+            page = result.data or []
+            
+            for col, col_values in values.items():
+                col_values.extend(row.get(col) for row in page)
+            
+            if len(page) < page_size:
+                break
+            offset += page_size
+        
+        df = pd.DataFrame(values)
+        if 'transaction_date' in df:
+            df['transaction_date'] = pd.to_datetime(df['transaction_date'], format='%Y-%m-%d', cache=True)
+        if 'amount' in df:
+            df['amount'] = df['amount'].astype('float64')
+        return df
+    
     def get_transaction_stats(self, client_id: str) -> Dict[str, Any]:
         """Get transaction statistics for a client."""
         try:
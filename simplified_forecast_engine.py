@@ -4,8 +4,10 @@ Simplified Cash Flow Forecast Engine
 Works with existing database structure
 """
 
+import re
 import sys
 import json
+import logging
 from datetime import datetime, date, timedelta
 from decimal import Decimal
 from typing import List, Dict, Tuple, Optional
@@ -14,203 +16,301 @@ import numpy as np
 
 sys.path.append('.')
 from supabase_client import supabase
+from utils.ttl_cache import TTLCache
+from utils.forecast_periods import build_forecast_periods
+from utils.numba_compat import njit, prange
+
+logger = logging.getLogger(__name__)
+
+# Raw vendors rows per client, shared by every engine instance; dropped on forecast edits
+vendors_cache = TTLCache(maxsize=128, ttl=60)
+
+# forecast_frequency codes for accumulate_forecasts; anything else is monthly
+FREQUENCY_CODES = {'daily': 0, 'weekly': 1, 'bi-weekly': 2}
+MONTHLY_FREQUENCY = 3
+
+@njit('void(f8[:], i1[:], i8[:], i8[:], i8[:], i8[:], i8[:], f8[:, :])', parallel=True, cache=True)
+def accumulate_forecasts(amounts, frequencies, forecast_days, subcat_idx, weekdays, days, isoweeks, out):
+    """
+    Add each vendor's amount to out[week, subcategory] for every week its
+    schedule hits: daily on weekdays, weekly on its forecast_day, bi-weekly on
+    even ISO weeks, and otherwise (monthly) in each month's first seven days.
+    
+    Weeks are split across threads, so each thread owns its rows of `out`
+    and no reduction buffers are needed.
+    """
+    for w in prange(weekdays.shape[0]):
+        for v in range(amounts.shape[0]):
+            frequency = frequencies[v]
+            if frequency == 0:
+                hit = weekdays[w] < 5  # Monday-Friday
+            elif frequency == 1:
+                hit = weekdays[w] == forecast_days[v]
+            elif frequency == 2:
+                hit = isoweeks[w] % 2 == 0
+            else:
+                hit = days[w] <= 7
+            if hit:
+                out[w, subcat_idx[v]] += amounts[v]
 
 class SimplifiedForecastEngine:
+    # Standard cash flow categories that match Google Sheets
+    categories = {
+        'revenue': {
+            'core_capital': {'name': 'Core Capital', 'is_inflow': True},
+            'operating_revenue': {'name': 'Operating Revenue', 'is_inflow': True}
+        },
+        'operating': {
+            'cc': {'name': 'CC', 'is_inflow': False},
+            'ops': {'name': 'Ops', 'is_inflow': False},
+            'ga': {'name': 'G&A', 'is_inflow': False},
+            'payroll': {'name': 'Payroll', 'is_inflow': False},
+            'admin': {'name': 'Admin', 'is_inflow': False}
+        },
+        'financing': {
+            'distributions': {'name': 'Distributions', 'is_inflow': False},
+            'equity_contrib': {'name': 'Equity Contrib.', 'is_inflow': True},
+            'loan_proceeds': {'name': 'Loan Proceeds', 'is_inflow': True},
+            'loan_payments': {'name': 'Loan Payments', 'is_inflow': False}
+        }
+    }
+
     def __init__(self, client_id: str):
         self.client_id = client_id
         
-        # Standard cash flow categories that match Google Sheets
-        self.categories = {
-            'revenue': {
-                'core_capital': {'name': 'Core Capital', 'is_inflow': True},
-                'operating_revenue': {'name': 'Operating Revenue', 'is_inflow': True}
-            },
-            'operating': {
-                'cc': {'name': 'CC', 'is_inflow': False},
-                'ops': {'name': 'Ops', 'is_inflow': False},
-                'ga': {'name': 'G&A', 'is_inflow': False},
-                'payroll': {'name': 'Payroll', 'is_inflow': False},
-                'admin': {'name': 'Admin', 'is_inflow': False}
-            },
-            'financing': {
-                'distributions': {'name': 'Distributions', 'is_inflow': False},
-                'equity_contrib': {'name': 'Equity Contrib.', 'is_inflow': True},
-                'loan_proceeds': {'name': 'Loan Proceeds', 'is_inflow': True},
-                'loan_payments': {'name': 'Loan Payments', 'is_inflow': False}
-            }
-        }
+        # Vendor name keyword rules, compiled once. Revenue is checked first,
+        # then the expense/financing rules in order (first match wins)
+        self._revenue_pattern = re.compile(r'AMAZON|SHOPIFY|STRIPE|PAYPAL')
+        self._core_capital_pattern = re.compile(r'CORE|CAPITAL|INVESTMENT')
+        self._category_rules = [
+            ('operating', 'cc', re.compile(r'AMEX|AMERICAN EXPRESS|CHASE CREDIT|CREDIT CARD')),
+            ('operating', 'ops', re.compile(r'FACEBOOK|GOOGLE|ADS|MARKETING')),
+            ('operating', 'ga', re.compile(r'QUICKBOOKS|OFFICE|UTILITIES')),
+            ('operating', 'payroll', re.compile(r'GUSTO|PAYROLL|SALARY|WAGE')),
+            ('operating', 'admin', re.compile(r'ADMIN|MISC|OTHER')),
+            ('financing', 'distributions', re.compile(r'DISTRIBUTION|OWNER')),
+            ('financing', 'loan_payments', re.compile(r'LOAN|DEBT|PAYMENT')),
+            ('financing', 'equity_contrib', re.compile(r'EQUITY|INVESTMENT|CAPITAL INJECTION'))
+        ]
+        # All rules as one anchored alternation for str.extract. Each branch is a
+        # lookahead so rule order (not match position) decides which group fires
+        self._category_rule_scan = re.compile('^(?:' + '|'.join(
+            f'(?=.*(?:{pattern.pattern}))(?P<rule{i}>)'
+            for i, (_, _, pattern) in enumerate(self._category_rules)
+        ) + ')', re.DOTALL)
     
     def get_vendor_forecast_data(self, weeks: int = 12) -> Dict:
         """Get forecast data using existing vendors table"""
         
-        # Get vendors with forecast data
-        try:
-            vendors_result = supabase.table('vendors').select(
-                'vendor_name, display_name, category, forecast_amount, forecast_frequency, forecast_day, is_revenue'
-            ).eq('client_id', self.client_id).execute()
-            
-            vendors = vendors_result.data
-            print(f"Found {len(vendors)} vendors for {self.client_id}")
-            
-        except Exception as e:
-            print(f"Error getting vendors: {e}")
-            vendors = []
-        
         # Generate forecast periods (weeks)
         today = date.today()
         days_behind = today.weekday()
         start_date = today - timedelta(days=days_behind)  # This Monday
         
-        periods = []
-        for i in range(weeks):
-            week_start = start_date + timedelta(weeks=i)
-            periods.append({
-                'week_number': i + 1,
-                'start_date': week_start,
-                'display_text': f"{week_start.month}/{week_start.day}/{str(week_start.year)[2:]}"
-            })
+        periods = build_forecast_periods(start_date, weeks)
         
-        # Create forecast data structure matching the frontend expectations
-        forecast_data = {}
+        # Weeks x subcategories matrix of forecast totals, summed in the database
+        try:
+            forecasted = self._fetch_forecast_buckets(periods)
+        except Exception as e:
+            logger.warning("forecast_buckets RPC failed (%s), aggregating vendors locally", e)
+            forecasted = self._aggregate_vendor_forecasts(periods)
         
-        # Initialize all periods
-        for period in periods:
-            date_key = period['start_date'].isoformat()
-            forecast_data[date_key] = {
-                'revenue': {},
-                'operating': {},
-                'financing': {}
+        # Create forecast data structure matching the frontend expectations.
+        # Dates stay date objects; the API's orjson response serializes them
+        forecast_data = {
+            period['start_date']: {
+                category: {
+                    subcat_key: {**_ZERO_CELL, 'forecasted': row[_SUBCAT_INDEX[(category, subcat_key)]]}
+                    for subcat_key in subcats
+                }
+                for category, subcats in _CATEGORY_LAYOUT.items()
             }
-            
-            # Initialize all categories with zero values
-            for category, subcats in self.categories.items():
-                forecast_data[date_key][category] = {}
-                for subcat_key, subcat_info in subcats.items():
-                    forecast_data[date_key][category][subcat_key] = {
-                        'forecasted': 0,
-                        'actual': 0,
-                        'variance': 0,
-                        'is_actual': False
-                    }
-        
-        # Map vendors to categories and generate forecasts
-        for vendor in vendors:
-            # Determine category based on vendor data
-            category, subcategory = self._categorize_vendor(vendor)
-            
-            if category and subcategory:
-                forecast_amount = float(vendor.get('forecast_amount', 0) or 0)
-                
-                # Generate forecasts for each period based on frequency
-                for period in periods:
-                    if self._should_forecast_for_date(vendor, period['start_date']):
-                        date_key = period['start_date'].isoformat()
-                        forecast_data[date_key][category][subcategory]['forecasted'] += forecast_amount
+            for period, row in zip(periods, forecasted.tolist())
+        }
         
         # Get cash balance (simplified)
         cash_balances = {
-            periods[0]['start_date'].isoformat(): {
+            periods[0]['start_date']: {
                 'beginning_balance': 476121,  # Default balance
-                'balance_date': periods[0]['start_date'].isoformat()
+                'balance_date': periods[0]['start_date']
             }
         }
         
         return {
             'forecast_data': forecast_data,
             'cash_balances': cash_balances,
-            'start_date': start_date.isoformat(),
-            'end_date': (start_date + timedelta(weeks=weeks)).isoformat()
+            'start_date': start_date,
+            'end_date': start_date + timedelta(weeks=len(periods))
         }
     
-    def _categorize_vendor(self, vendor: Dict) -> Tuple[str, str]:
-        """Categorize vendor into cash flow categories"""
-        
-        vendor_name = vendor.get('vendor_name', '').upper()
-        display_name = vendor.get('display_name', '').upper()
-        category = vendor.get('category', '').lower()
-        is_revenue = vendor.get('is_revenue', False)
-        
-        # Revenue classification
-        if is_revenue or any(term in vendor_name for term in ['AMAZON', 'SHOPIFY', 'STRIPE', 'PAYPAL']):
-            if any(term in vendor_name for term in ['CORE', 'CAPITAL', 'INVESTMENT']):
-                return 'revenue', 'core_capital'
-            else:
-                return 'revenue', 'operating_revenue'
-        
-        # Expense classification
-        if any(term in vendor_name for term in ['AMEX', 'AMERICAN EXPRESS', 'CHASE CREDIT', 'CREDIT CARD']):
-            return 'operating', 'cc'
-        elif any(term in vendor_name for term in ['FACEBOOK', 'GOOGLE', 'ADS', 'MARKETING']):
-            return 'operating', 'ops'
-        elif any(term in vendor_name for term in ['QUICKBOOKS', 'OFFICE', 'UTILITIES']):
-            return 'operating', 'ga'
-        elif any(term in vendor_name for term in ['GUSTO', 'PAYROLL', 'SALARY', 'WAGE']):
-            return 'operating', 'payroll'
-        elif any(term in vendor_name for term in ['ADMIN', 'MISC', 'OTHER']):
-            return 'operating', 'admin'
-        elif any(term in vendor_name for term in ['DISTRIBUTION', 'OWNER']):
-            return 'financing', 'distributions'
-        elif any(term in vendor_name for term in ['LOAN', 'DEBT', 'PAYMENT']):
-            return 'financing', 'loan_payments'
-        elif any(term in vendor_name for term in ['EQUITY', 'INVESTMENT', 'CAPITAL INJECTION']):
-            return 'financing', 'equity_contrib'
-        else:
-            # Default based on amount sign
-            amount = float(vendor.get('forecast_amount', 0) or 0)
-            if amount > 0:
-                return 'revenue', 'operating_revenue'
-            else:
-                return 'operating', 'ops'
+    def _fetch_forecast_buckets(self, periods: Tuple[Dict, ...]) -> np.ndarray:
+        """
+        Run the forecast_buckets RPC (see database/analysis_functions.sql) and
+        scatter its rows into a weeks x subcategories matrix.
+        """
+        result = supabase.rpc('forecast_buckets', {
+            'p_client_id': self.client_id,
+            'p_start_date': periods[0]['start_date'].isoformat(),
+            'p_weeks': len(periods)
+        }).execute()
+        rows = result.data or []
+        
+        forecasted = np.zeros((len(periods), len(_SUBCAT_INDEX)))
+        if rows:
+            week_index = {period['start_date'].isoformat(): i for i, period in enumerate(periods)}
+            week_idx = np.fromiter((week_index[row['week_start']] for row in rows), dtype=np.intp, count=len(rows))
+            subcat_idx = np.fromiter(
+                (_SUBCAT_INDEX[(row['category'], row['subcategory'])] for row in rows),
+                dtype=np.intp, count=len(rows)
+            )
+            amounts = np.fromiter((float(row['forecasted']) for row in rows), dtype=np.float64, count=len(rows))
+            np.add.at(forecasted, (week_idx, subcat_idx), amounts)
+        return forecasted
     
-    def _should_forecast_for_date(self, vendor: Dict, forecast_date: date) -> bool:
-        """Determine if vendor should have forecast for specific date"""
-        
-        frequency = vendor.get('forecast_frequency', 'monthly')
-        forecast_day = vendor.get('forecast_day')
-        
-        if frequency == 'daily':
-            return forecast_date.weekday() < 5  # Monday-Friday
-        elif frequency == 'weekly':
-            return forecast_date.weekday() == (forecast_day or 0)  # Default Monday
-        elif frequency == 'bi-weekly':
-            # Simplified: every other week
-            week_number = forecast_date.isocalendar()[1]
-            return week_number % 2 == 0
-        elif frequency == 'monthly':
-            # First week of month
-            return forecast_date.day <= 7
-        else:
-            # Default monthly
-            return forecast_date.day <= 7
-
-    def get_vendor_groups(self) -> List[Dict]:
-        """Get simplified vendor groups for the frontend"""
-        
-        groups = []
-        group_id = 1
-        
-        for category, subcats in self.categories.items():
-            for subcat_key, subcat_info in subcats.items():
-                groups.append({
-                    'id': group_id,
-                    'group_name': subcat_key,
-                    'display_name': subcat_info['name'],
-                    'category': category,
-                    'subcategory': subcat_key,
-                    'is_inflow': subcat_info['is_inflow']
-                })
-                group_id += 1
-        
-        return groups
+    def _aggregate_vendor_forecasts(self, periods: Tuple[Dict, ...]) -> np.ndarray:
+        """
+        Local equivalent of forecast_buckets for databases without the function.
+        
+        Vendors are categorized with pandas, then one compiled kernel applies
+        the frequency rules and accumulates the weeks x subcategories matrix.
+        """
+        forecasted = np.zeros((len(periods), len(_SUBCAT_INDEX)))
+        
+        try:
+            vendors = self._fetch_vendors()
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Found %d vendors for %s", len(vendors), self.client_id)
+            
+        except Exception as e:
+            logger.error("Error getting vendors: %s", e)
+            vendors = []
+        
+        if not vendors:
+            return forecasted
+        
+        vendor_df = pd.DataFrame(vendors)
+        vendor_df['forecast_amount'] = pd.to_numeric(
+            vendor_df['forecast_amount'], errors='coerce'
+        ).fillna(0.0)
+        categories, subcategories = self._categorize_vendor_frame(vendor_df)
+        
+        # Typed per-vendor columns
+        amounts = vendor_df['forecast_amount'].to_numpy(np.float64)
+        subcat_idx = _SUBCAT_KEYS.get_indexer(
+            pd.MultiIndex.from_arrays([categories, subcategories])
+        ).astype(np.int64)
+        frequencies = vendor_df['forecast_frequency'].map(FREQUENCY_CODES).fillna(
+            MONTHLY_FREQUENCY
+        ).to_numpy(np.int8)
+        # forecast_day is TEXT: blank keeps the Monday default, anything
+        # non-numeric gets -1 so it never matches (same as forecast_buckets)
+        forecast_day = vendor_df['forecast_day']
+        blank = forecast_day.fillna('').astype(str).str.strip().eq('')
+        forecast_days = pd.to_numeric(forecast_day, errors='coerce').fillna(
+            pd.Series(np.where(blank, 0, -1), index=vendor_df.index)
+        ).to_numpy(np.int64)
+        
+        weekdays = np.array([p['start_date'].weekday() for p in periods], dtype=np.int64)
+        days = np.array([p['start_date'].day for p in periods], dtype=np.int64)
+        isoweeks = np.array([p['start_date'].isocalendar()[1] for p in periods], dtype=np.int64)
+        
+        accumulate_forecasts(amounts, frequencies, forecast_days, subcat_idx, weekdays, days, isoweeks, forecasted)
+        return forecasted
+    
+    def _fetch_vendors(self) -> List[Dict]:
+        """Vendors with forecast data for this client, cached for a minute"""
+        return vendors_cache.get_or_load(
+            self.client_id,
+            lambda: supabase.table('vendors').select(
+                'vendor_name, display_name, category, forecast_amount, forecast_frequency, forecast_day, is_revenue'
+            ).eq('client_id', self.client_id).execute().data
+        )
+    
+    def _categorize_vendor_frame(self, vendors: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+        """Categorize every vendor into cash flow (category, subcategory) arrays for a vendors frame"""
+        
+        vendor_names = vendors['vendor_name'].fillna('').astype(str).str.upper()
+        
+        is_revenue = (
+            vendors['is_revenue'].fillna(False).astype(bool) |
+            vendor_names.str.contains(self._revenue_pattern.pattern, regex=True)
+        ).to_numpy()
+        is_core_capital = vendor_names.str.contains(self._core_capital_pattern.pattern, regex=True).to_numpy()
+        
+        # One regex scan per name; the participating group is the first matching rule
+        rule_hits = vendor_names.str.extract(self._category_rule_scan).notna().to_numpy()
+        has_rule = rule_hits.any(axis=1)
+        first_rule = rule_hits.argmax(axis=1)
+        rule_categories = np.array([rule[0] for rule in self._category_rules])[first_rule]
+        rule_subcategories = np.array([rule[1] for rule in self._category_rules])[first_rule]
+        
+        # Revenue first, then the first matching expense rule; default based on amount sign
+        is_positive = (vendors['forecast_amount'] > 0).to_numpy()
+        categories = np.select(
+            [is_revenue, has_rule, is_positive],
+            ['revenue', rule_categories, 'revenue'],
+            default='operating'
+        )
+        subcategories = np.select(
+            [is_revenue & is_core_capital, is_revenue, has_rule, is_positive],
+            ['core_capital', 'operating_revenue', rule_subcategories, 'operating_revenue'],
+            default='ops'
+        )
+        return categories, subcategories
+    
+    @staticmethod
+    def get_vendor_groups() -> List[Dict]:
+        """Get simplified vendor groups for the frontend (the same for every client)"""
+        return list(_VENDOR_GROUPS)
 
     def update_forecast_cell(self, forecast_date: str, vendor_group_id: int, new_amount: float) -> bool:
         """Update forecast amount (simplified - could store in vendors table)"""
         # For now, just return success
         # In a full implementation, this would update the vendor forecast amounts
-        print(f"Updated forecast: {forecast_date} group {vendor_group_id} = ${new_amount}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Updated forecast: %s group %s = $%s", forecast_date, vendor_group_id, new_amount)
+        vendors_cache.pop(self.client_id)
         return True
 
 
+def _build_vendor_groups(categories: Dict) -> Tuple[Dict, ...]:
+    """Flatten the category tree into numbered vendor groups"""
+    groups = []
+    group_id = 1
+    
+    for category, subcats in categories.items():
+        for subcat_key, subcat_info in subcats.items():
+            groups.append({
+                'id': group_id,
+                'group_name': subcat_key,
+                'display_name': subcat_info['name'],
+                'category': category,
+                'subcategory': subcat_key,
+                'is_inflow': subcat_info['is_inflow']
+            })
+            group_id += 1
+    
+    return tuple(groups)
+
+
+# Same for every client, so built once at import
+_VENDOR_GROUPS = _build_vendor_groups(SimplifiedForecastEngine.categories)
+
+# Empty forecast cell and the category -> subcategories layout of each period
+_ZERO_CELL = {'forecasted': 0, 'actual': 0, 'variance': 0, 'is_actual': False}
+_CATEGORY_LAYOUT = {
+    category: tuple(subcats) for category, subcats in SimplifiedForecastEngine.categories.items()
+}
+# Column of each (category, subcategory) in the forecast matrix
+_SUBCAT_INDEX = {
+    key: i for i, key in enumerate(
+        (category, subcat_key) for category, subcats in _CATEGORY_LAYOUT.items() for subcat_key in subcats
+    )
+}
+_SUBCAT_KEYS = pd.MultiIndex.from_tuples(list(_SUBCAT_INDEX))
+
+
 def main():
     """Test the simplified forecast engine"""
     import argparse
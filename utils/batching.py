@@ -0,0 +1,27 @@
+"""
+Fixed-size batching for bulk Supabase writes.
+
+PostgREST accepts a list of rows per insert/upsert, so writing in batches
+keeps the number of round trips low while bounding each request's size.
+"""
+
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar('T')
+
+# Rows per insert/upsert request
+WRITE_BATCH_SIZE = 500
+
+
+def chunks(items: Iterable[T], size: int = WRITE_BATCH_SIZE) -> Iterator[List[T]]:
+    """Yield successive lists of at most `size` items."""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+__all__ = ['WRITE_BATCH_SIZE', 'chunks']
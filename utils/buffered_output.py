@@ -0,0 +1,27 @@
+"""
+Buffered stdout for the print-heavy analysis reports.
+
+Wrapping a report in `buffered_stdout()` collects every print() in memory and
+hands the whole report to the real stdout in a single write, instead of one
+write (and often one flush) per line.
+"""
+
+import io
+import sys
+from contextlib import contextmanager, redirect_stdout
+
+
+@contextmanager
+def buffered_stdout():
+    """Capture prints inside the block and emit them with one write on exit."""
+    buffer = io.StringIO()
+    try:
+        with redirect_stdout(buffer):
+            yield buffer
+    finally:
+        # Still emit the partial report if the block raised
+        sys.stdout.write(buffer.getvalue())
+        sys.stdout.flush()
+
+
+__all__ = ['buffered_stdout']
@@ -0,0 +1,53 @@
+"""
+Weekly forecast periods shared by the dashboard endpoints and forecast engines.
+"""
+
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+# Upper bound on requested forecast weeks; `weeks` comes straight from the
+# query string and keys the period cache
+MAX_FORECAST_WEEKS = 52
+
+
+def clamp_weeks(weeks: int) -> int:
+    """Limit a requested week count to 1..MAX_FORECAST_WEEKS."""
+    return max(1, min(weeks, MAX_FORECAST_WEEKS))
+
+
+@lru_cache(maxsize=32)
+def _period_rows(start_date: date, weeks: int) -> Tuple[tuple, ...]:
+    # Immutable rows so the cached value can't be changed by a caller
+    rows = []
+    for i in range(weeks):
+        week_start = start_date + timedelta(weeks=i)
+        week_end = week_start + timedelta(days=6)
+        rows.append((
+            i + 1,
+            week_start,
+            week_end,
+            f"{week_start.month}/{week_start.day}/{str(week_start.year)[2:]}"
+        ))
+    return tuple(rows)
+
+
+def build_forecast_periods(start_date: date, weeks: int) -> List[Dict]:
+    """
+    Week periods starting at the Monday start_date, `weeks` clamped to
+    1..MAX_FORECAST_WEEKS.
+
+    The rows are cached until Monday rolls over; each call gets its own dicts.
+    """
+    return [
+        {
+            'week_number': week_number,
+            'start_date': week_start,
+            'end_date': week_end,
+            'display_text': display_text
+        }
+        for week_number, week_start, week_end, display_text in _period_rows(start_date, clamp_weeks(weeks))
+    ]
+
+
+__all__ = ['MAX_FORECAST_WEEKS', 'clamp_weeks', 'build_forecast_periods']
@@ -0,0 +1,63 @@
+"""
+Local on-disk cache for DataFrames fetched from Supabase.
+
+Analysis scripts re-run against the same window many times while iterating;
+`cached_frame` memoizes a fetch function's result under ~/.cfo_forecast/cache
+so later runs skip the network round trips until the entry goes stale.
+"""
+
+import hashlib
+import time
+from functools import wraps
+from pathlib import Path
+
+import pandas as pd
+
+CACHE_DIR = Path.home() / '.cfo_forecast' / 'cache'
+DEFAULT_MAX_AGE = 3600  # seconds
+
+
+def _cache_path(func, args, kwargs) -> Path:
+    key = repr((args, sorted(kwargs.items())))
+    digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+    return CACHE_DIR / f"{func.__module__}.{func.__name__}_{digest}.pkl"
+
+
+def cached_frame(max_age: float = DEFAULT_MAX_AGE):
+    """
+    Decorate a function returning a DataFrame so its result is reused from
+    disk for max_age seconds. Arguments must have a stable repr (strings,
+    numbers, dates) since they form the cache key.
+
+    Pass refresh=True to the decorated function to bypass the cache.
+    Empty results are not cached.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, refresh: bool = False, **kwargs):
+            path = _cache_path(func, args, kwargs)
+
+            if not refresh:
+                try:
+                    if path.stat().st_mtime > time.time() - max_age:
+                        return pd.read_pickle(path)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    print(f"Warning: ignoring unreadable cache {path}: {e}")
+
+            df = func(*args, **kwargs)
+
+            if df is not None and not df.empty:
+                try:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    df.to_pickle(path)
+                except OSError as e:
+                    print(f"Warning: could not write cache {path}: {e}")
+
+            return df
+        return wrapper
+    return decorator
+
+
+__all__ = ['cached_frame', 'CACHE_DIR', 'DEFAULT_MAX_AGE']
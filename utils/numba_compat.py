@@ -0,0 +1,32 @@
+"""
+Optional Numba support.
+
+`njit` compiles with numba when it is installed and otherwise returns the
+function unchanged, so kernels still run (slower) as plain Python.
+
+Pass an explicit signature (e.g. `@njit('f8(i8[:])', cache=True)`) to compile
+eagerly at import time instead of on the first call. `prange` is numba's
+parallel range with `parallel=True`, and plain `range` otherwise.
+"""
+
+try:
+    from numba import njit as _numba_njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    _numba_njit = None
+    prange = range  # parallel loops run serially without numba
+    NUMBA_AVAILABLE = False
+
+
+def njit(*args, **kwargs):
+    """Drop-in for numba.njit that degrades to a no-op decorator."""
+    if NUMBA_AVAILABLE:
+        return _numba_njit(*args, **kwargs)
+    
+    # Support both @njit and @njit(cache=True)
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+    return lambda func: func
+
+
+__all__ = ['njit', 'prange', 'NUMBA_AVAILABLE']
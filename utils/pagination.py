@@ -0,0 +1,71 @@
+"""
+Keyset pagination over transactions.
+
+Pages are ordered newest first by (transaction_date, id). A cursor
+is an opaque base64 token holding the last row's sort key, so each page is an
+indexed range scan of `limit` rows no matter how deep the client has paged,
+unlike offset pagination where the server re-reads every skipped row.
+"""
+
+import base64
+import json
+from datetime import date
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# Columns returned by the paged transactions endpoints; must include the
+# cursor's sort key (transaction_date, id). id is the primary key, so unlike
+# transaction_id it is always present and unique
+TRANSACTION_LIST_COLUMNS = 'id, transaction_id, transaction_date, vendor_name, amount, description'
+
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Build the cursor that resumes after `row`."""
+    key = {'d': row['transaction_date'], 'i': row['id']}
+    return base64.urlsafe_b64encode(json.dumps(key).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    """Decode a cursor token; raises ValueError if it is malformed."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        # Both values end up in a PostgREST filter string, so only accept an
+        # ISO date and an integer id
+        return {'transaction_date': date.fromisoformat(key['d']).isoformat(), 'id': int(key['i'])}
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
+def apply_transaction_cursor(query, cursor: Optional[str]):
+    """
+    Restrict a transactions query to rows after `cursor` and order it newest
+    first. Call before .limit(); with no cursor only the ordering is applied.
+    """
+    if cursor:
+        key = decode_cursor(cursor)
+        last_date = key['transaction_date']
+        last_id = key['id']
+        query = query.or_(
+            f"transaction_date.lt.{last_date},"
+            f"and(transaction_date.eq.{last_date},id.lt.{last_id})"
+        )
+    return query.order('transaction_date', desc=True).order('id', desc=True)
+
+
+def iter_transaction_pages(make_query: Callable[[], Any], page_size: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield successive keyset pages of a transactions query, newest first.
+
+    `make_query` returns a fresh filtered query (e.g. select + client_id eq);
+    it is called once per page because PostgREST builders are not reusable.
+    """
+    cursor = None
+    while True:
+        page = apply_transaction_cursor(make_query(), cursor).limit(page_size).execute().data or []
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        cursor = encode_cursor(page[-1])
+
+
+__all__ = ['TRANSACTION_LIST_COLUMNS', 'encode_cursor', 'decode_cursor', 'apply_transaction_cursor', 'iter_transaction_pages']